@@ -0,0 +1,822 @@
+"""
+Offline end-to-end benchmark / load test for the Job Portal backend.
+
+Runs the real FastAPI app in a subprocess with the deterministic `stub_llm`
+standing in for Gemini, seeds a throwaway SQLite database, then drives
+concurrent /ws/match sessions alongside /jobs, /login and /parse-resume-text
+traffic. Results are written as JSON so runs can be diffed between commits.
+
+Usage:
+    python benchmark.py run --jobs 500 --sessions 200 --concurrency 200 --latency-ms 80
+    python benchmark.py compare bench_results/old.json bench_results/new.json
+    python benchmark.py protocol --jobs 500
+    python benchmark.py agents --truncate-rate 0.2 --failure-rate 0.05
+    python benchmark.py scheduler --rpm 600
+    python benchmark.py coldstart --repeat 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+BENCH_PASSWORD = "bench-password"
+
+RESUMES = [
+    "Backend engineer with Python, FastAPI and SQL. Deployed services on AWS with Docker.",
+    "Frontend developer focused on React and JavaScript. Built design systems and dashboards.",
+    "Machine learning engineer using PyTorch and Scikit-learn for data science pipelines.",
+    "DevOps engineer experienced with AWS, Docker, Go and cloud technologies (GCP).",
+    "Product manager with an analyst background, SQL skills and Agile methodologies.",
+]
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    k = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[k]
+
+
+def summarize(samples: List[float]) -> Dict:
+    return {
+        "count": len(samples),
+        "mean_ms": round(sum(samples) / len(samples), 3) if samples else 0.0,
+        "p50_ms": round(percentile(samples, 50), 3),
+        "p99_ms": round(percentile(samples, 99), 3),
+        "max_ms": round(max(samples), 3) if samples else 0.0,
+    }
+
+
+def git_revision(cwd: str = None) -> str:
+    try:
+        rev = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                      stderr=subprocess.DEVNULL, cwd=cwd).strip()
+        dirty = subprocess.call(["git", "diff", "--quiet", "HEAD"], stderr=subprocess.DEVNULL, cwd=cwd)
+        return f"{rev}-dirty" if dirty else rev
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+# ---------------------------------------------------------------------------
+# Server side (runs in the child process)
+# ---------------------------------------------------------------------------
+
+class LoopLagMonitor:
+    """Samples how late the event loop wakes up from a fixed short sleep."""
+
+    def __init__(self, interval: float = 0.02):
+        self.interval = interval
+        self.samples: List[float] = []
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append((loop.time() - start - self.interval) * 1000)
+
+
+def serve(args):
+    import uvicorn
+    import stub_llm
+    import main
+    import llm_scheduler
+    import structured_output
+
+    stub = stub_llm.install(stub_llm.StubLLM(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        per_kchar_ms=args.per_kchar_ms,
+        failure_rate=args.failure_rate,
+        truncate_rate=args.truncate_rate,
+        seed=args.seed,
+    ))
+    monitor = LoopLagMonitor()
+
+    async def start_monitor():
+        asyncio.get_running_loop().create_task(monitor.run())
+
+    @main.app.get("/__bench/stats")
+    def bench_stats():
+        samples, monitor.samples = monitor.samples, []
+        return {"loop_lag": summarize(samples), "llm_calls": stub.calls, "llm_failures": stub.failures,
+                "llm_truncations": stub.truncations, "agents": structured_output.stats.snapshot(),
+                "llm_queue": llm_scheduler.scheduler.metrics()}
+
+    main.app.add_event_handler("startup", start_monitor)
+    uvicorn.run(main.app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+# ---------------------------------------------------------------------------
+# Client side
+# ---------------------------------------------------------------------------
+
+def prepare_database(args) -> List[str]:
+    """Creates schema, seeds jobs and bench users. Returns student usernames."""
+    import auth
+    import migrate
+    import models
+    import seed
+    from database import SessionLocal
+
+    migrate.migrate()
+    db = SessionLocal()
+    try:
+        rng = random.Random(args.seed)
+        db.add_all(seed.generate_jobs(args.jobs, rng))
+        # bcrypt is deliberately slow; hash once and share it across bench users.
+        hashed = auth.get_password_hash(BENCH_PASSWORD)
+        students = [f"bench_student_{i}" for i in range(args.students)]
+        db.add_all(
+            models.User(username=name, email=f"{name}@bench.local", hashed_password=hashed,
+                        role=models.UserRole.student)
+            for name in students
+        )
+        db.add(models.User(username="bench_employer", email="bench_employer@bench.local",
+                           hashed_password=hashed, role=models.UserRole.employer))
+        db.commit()
+    finally:
+        db.close()
+    return students
+
+
+def start_server(args, env: Dict) -> subprocess.Popen:
+    cmd = [
+        sys.executable, os.path.abspath(__file__), "serve",
+        "--port", str(args.port),
+        "--latency-ms", str(args.latency_ms),
+        "--jitter-ms", str(args.jitter_ms),
+        "--per-kchar-ms", str(args.per_kchar_ms),
+        "--failure-rate", str(args.failure_rate),
+        "--truncate-rate", str(args.truncate_rate),
+        "--seed", str(args.seed),
+    ]
+    return subprocess.Popen(cmd, env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+
+
+async def wait_ready(client, proc: subprocess.Popen, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Benchmark server exited with code {proc.returncode}")
+        try:
+            res = await client.get("/jobs")
+            if res.status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.1)
+    raise RuntimeError("Benchmark server did not become ready in time")
+
+
+class Recorder:
+    def __init__(self):
+        self.events: Dict[str, List[float]] = defaultdict(list)
+        self.http: Dict[str, List[float]] = defaultdict(list)
+        self.sessions: List[float] = []
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.reconnects = 0
+        self.ws_frames = 0
+        self.ws_bytes = 0
+
+
+async def ws_session(url: str, token: str, resume_text: str, rec: Recorder, timeout: float, drop: bool = False,
+                     protocol: int = 1, catalog_version: int = None):
+    """One match session; with `drop`, disconnects after the artifact and resumes by offset."""
+    import websockets
+
+    start = time.perf_counter()
+    opts = {"protocol": protocol, "catalog_version": catalog_version} if protocol > 1 else {}
+    first = {"token": token, "resume_text": resume_text, **opts}
+    session_id, last_offset = None, -1
+    try:
+        while True:
+            async with websockets.connect(url, max_size=None) as ws:
+                hello = first if session_id is None else {"token": token, "session_id": session_id, "last_offset": last_offset, **opts}
+                await ws.send(json.dumps(hello))
+                while True:
+                    frame = await asyncio.wait_for(ws.recv(), timeout)
+                    rec.ws_frames += 1
+                    rec.ws_bytes += len(frame)
+                    msg = json.loads(frame)
+                    for msg in msg["events"] if "events" in msg else [msg]:
+                        status = msg.get("status") or "error"
+                        session_id = msg.get("session_id", session_id)
+                        last_offset = msg.get("offset", last_offset)
+                        rec.events[status].append((time.perf_counter() - start) * 1000)
+                        if status == "error":
+                            rec.errors[f"ws:{msg.get('message') or msg.get('error')}"] += 1
+                            return
+                        if status == "complete":
+                            rec.sessions.append((time.perf_counter() - start) * 1000)
+                            return
+                        if drop and status == "artifact":
+                            break
+                    else:
+                        continue
+                    drop = False
+                    rec.reconnects += 1
+                    break
+    except Exception as e:
+        rec.errors[f"ws:{type(e).__name__}"] += 1
+
+
+async def http_worker(client, students: List[str], rec: Recorder, done: asyncio.Event, rng: random.Random,
+                      employer_token: str = None):
+    ops = ("GET /jobs", "POST /login", "POST /parse-resume-text")
+    if employer_token:
+        ops += ("POST /jobs",)
+    i = 0
+    while not done.is_set():
+        op = ops[i % len(ops)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            if op == "GET /jobs":
+                res = await client.get("/jobs")
+            elif op == "POST /jobs":
+                res = await client.post("/jobs", headers={"Authorization": f"Bearer {employer_token}"}, json={
+                    "title": "Backend Engineer - Software Engineering (Remote)", "company": "BenchCorp",
+                    "description": "Benchmark posting.", "requirements": "Python, FastAPI and SQL experience."})
+            elif op == "POST /login":
+                res = await client.post("/login", data={"username": rng.choice(students), "password": BENCH_PASSWORD})
+            else:
+                res = await client.post("/parser/parse-resume-text", data={"resume_text": rng.choice(RESUMES)})
+            if res.status_code >= 400:
+                rec.errors[f"{op}:{res.status_code}"] += 1
+                continue
+        except Exception as e:
+            rec.errors[f"{op}:{type(e).__name__}"] += 1
+            continue
+        rec.http[op].append((time.perf_counter() - start) * 1000)
+
+
+async def drive(args, students: List[str], proc: subprocess.Popen) -> Dict:
+    import httpx
+    import auth
+
+    base = f"http://127.0.0.1:{args.port}"
+    ws_url = f"ws://127.0.0.1:{args.port}/ws/match"
+    limits = httpx.Limits(max_connections=args.http_workers * 2)
+    rng = random.Random(args.seed)
+    rec = Recorder()
+
+    async with httpx.AsyncClient(base_url=base, timeout=args.timeout, limits=limits) as client:
+        await wait_ready(client, proc)
+        await client.get("/__bench/stats")  # discard startup lag samples
+        catalog_version = int((await client.get("/jobs")).headers.get("X-Catalog-Version", 0))
+
+        tokens = [auth.create_access_token({"sub": name, "role": "student"}) for name in students]
+        employer_token = auth.create_access_token({"sub": "bench_employer", "role": "employer"}) if args.post_jobs else None
+        sem = asyncio.Semaphore(args.concurrency)
+
+        async def bounded(i: int):
+            async with sem:
+                drop = rng.random() < args.reconnect_rate
+                await ws_session(ws_url, tokens[i % len(tokens)], RESUMES[i % len(RESUMES)], rec, args.timeout, drop,
+                                 args.protocol, catalog_version)
+
+        done = asyncio.Event()
+        workers = [asyncio.create_task(http_worker(client, students, rec, done, random.Random(args.seed + w),
+                                               employer_token))
+                   for w in range(args.http_workers)]
+        start = time.perf_counter()
+        await asyncio.gather(*(bounded(i) for i in range(args.sessions)))
+        if args.sessions == 0:
+            await asyncio.sleep(args.duration)
+        elapsed = time.perf_counter() - start
+        done.set()
+        await asyncio.gather(*workers)
+
+        server_stats = (await client.get("/__bench/stats")).json()
+
+    http_total = sum(len(v) for v in rec.http.values())
+    return {
+        "throughput": {
+            "wall_time_s": round(elapsed, 3),
+            "sessions_completed": len(rec.sessions),
+            "sessions_per_s": round(len(rec.sessions) / elapsed, 3),
+            "reconnects": rec.reconnects,
+            "ws_frames": rec.ws_frames,
+            "ws_payload_bytes": rec.ws_bytes,
+            "http_requests": http_total,
+            "http_requests_per_s": round(http_total / elapsed, 3),
+        },
+        "session_ms": summarize(rec.sessions),
+        "websocket_events_ms": {k: summarize(v) for k, v in sorted(rec.events.items())},
+        "http_ms": {k: summarize(v) for k, v in sorted(rec.http.items())},
+        "event_loop_lag_ms": server_stats["loop_lag"],
+        "llm": {"calls": server_stats["llm_calls"], "injected_failures": server_stats["llm_failures"],
+                "injected_truncations": server_stats["llm_truncations"]},
+        "agents": server_stats["agents"],
+        "llm_queue": server_stats["llm_queue"],
+        "errors": dict(rec.errors),
+    }
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix="jobportal-bench-")
+    env = dict(os.environ)
+    env["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    env["UI_PAUSE_SCALE"] = str(args.pause_scale)
+    env["LLM_RPM"] = str(args.llm_rpm)
+    env["LLM_TPM"] = str(args.llm_tpm)
+    # The client imports database/auth too; point them at the same DB and secret.
+    os.environ.update({"DATABASE_URL": env["DATABASE_URL"]})
+
+    students = prepare_database(args)
+    proc = start_server(args, env)
+    try:
+        metrics = asyncio.run(drive(args, students, proc))
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+    result = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config": {k: v for k, v in vars(args).items() if k not in ("func", "out")},
+        },
+        **metrics,
+    }
+
+    out = args.out
+    if os.path.isdir(out) or not out.endswith(".json"):
+        os.makedirs(out, exist_ok=True)
+        out = os.path.join(out, f"{time.strftime('%Y%m%d-%H%M%S')}-{result['meta']['revision']}.json")
+    with open(out, "w") as f:
+        json.dump(result, f, indent=2)
+
+    t = result["throughput"]
+    print(f"Sessions: {t['sessions_completed']}/{args.sessions} in {t['wall_time_s']}s "
+          f"({t['sessions_per_s']}/s), HTTP: {t['http_requests_per_s']} req/s")
+    for name, s in result["websocket_events_ms"].items():
+        print(f"  ws {name:<10} p50={s['p50_ms']:>9.1f}ms p99={s['p99_ms']:>9.1f}ms n={s['count']}")
+    for name, s in result["http_ms"].items():
+        print(f"  {name:<24} p50={s['p50_ms']:>9.1f}ms p99={s['p99_ms']:>9.1f}ms n={s['count']}")
+    lag = result["event_loop_lag_ms"]
+    print(f"  event loop lag p50={lag['p50_ms']:.1f}ms p99={lag['p99_ms']:.1f}ms max={lag['max_ms']:.1f}ms")
+    print_agent_stats(result["agents"])
+    for priority, q in result["llm_queue"].items():
+        if q["admitted"] or q["rejected"] or q["timed_out"]:
+            print(f"  llm queue {priority:<11} admitted={q['admitted']} rejected={q['rejected']} timed_out={q['timed_out']} "
+                  f"wait p50={q['wait_p50_ms']:.1f}ms p99={q['wait_p99_ms']:.1f}ms")
+    if result["errors"]:
+        print(f"  errors: {result['errors']}")
+    print(f"Results written to {out}")
+
+
+def print_agent_stats(agents: Dict):
+    for agent, a in sorted(agents.items()):
+        print(f"  {agent:<8} calls={a['calls']} ok={a.get('ok', 0)} repaired={a.get('repaired', 0)} "
+              f"fallback={a['fallback_rate'] * 100:.1f}% (strict parse would fail {a['strict_failure_rate'] * 100:.1f}%) "
+              f"llm_calls={a.get('llm_calls', 0)}")
+
+
+def agents_bench(args):
+    """
+    Calls the three agents directly against the stub, with truncated and
+    failing responses injected, and reports how often each still fell back.
+    """
+    import catalog
+    import gemini_service
+    import seed
+    import stub_llm
+    import structured_output
+
+    stub = stub_llm.install(stub_llm.StubLLM(failure_rate=args.failure_rate,
+                                             truncate_rate=args.truncate_rate, seed=args.seed))
+    rows = [(i + 1, j.title, j.company, j.description, j.requirements)
+            for i, j in enumerate(seed.generate_jobs(args.jobs, random.Random(args.seed)))]
+    snapshot = catalog.CatalogSnapshot(rows)
+
+    async def run_agents():
+        for i in range(args.iterations):
+            resume = RESUMES[i % len(RESUMES)]
+            await gemini_service.generate_student_artifact(resume)
+            await gemini_service.rank_jobs(resume, snapshot.jobs, snapshot.jobs_json)
+            await gemini_service.audit_application(resume, f"Tailored for {snapshot.jobs[i % len(snapshot.jobs)]['title']}: {resume}")
+
+    asyncio.run(run_agents())
+
+    result = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "config": {k: v for k, v in vars(args).items() if k not in ("func", "out")},
+        },
+        "llm": {"calls": stub.calls, "injected_failures": stub.failures, "injected_truncations": stub.truncations},
+        "agents": structured_output.stats.snapshot(),
+    }
+    print_agent_stats(result["agents"])
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"Results written to {args.out}")
+
+
+def scheduler_bench(args):
+    """
+    Floods one scheduler with a heavy student (many concurrent sessions' worth
+    of calls) and a batch of resume parses while light students make a few
+    calls each, under an RPM limit. Runs once with fair queuing and once as a
+    single FIFO (every call the same user and priority) for comparison.
+    """
+    import llm_scheduler
+
+    latency = args.latency_ms / 1000
+
+    async def scenario(fair: bool) -> Dict:
+        sched = llm_scheduler.LLMScheduler(rpm=args.rpm, tpm=0, max_queue=args.max_queue,
+                                           max_batch_queue=args.max_queue, max_queue_per_user=args.per_user,
+                                           max_wait=args.max_wait, burst_seconds=args.burst_seconds)
+        latencies: Dict[str, List[float]] = defaultdict(list)
+        rejected: Dict[str, int] = defaultdict(int)
+
+        async def call(group: str, user: str, priority: str):
+            start = time.perf_counter()
+            try:
+                if fair:
+                    await sched.submit(lambda: time.sleep(latency), 1000, user=user, priority=priority)
+                else:
+                    await sched.submit(lambda: time.sleep(latency), 1000, user="all", priority="interactive")
+            except llm_scheduler.LLMQueueFull:
+                rejected[group] += 1
+                return
+            latencies[group].append((time.perf_counter() - start) * 1000)
+
+        async def light_user(i: int):
+            await asyncio.sleep(args.light_delay_ms / 1000)  # arrive after the flood is queued
+            for _ in range(args.light_calls):
+                await call("light students", f"student:light{i}", "interactive")
+
+        await asyncio.gather(*[call("heavy student", "student:heavy", "interactive") for _ in range(args.heavy_calls)],
+                             *[call("batch parsing", "client:batch", "batch") for _ in range(args.batch_calls)],
+                             *[light_user(i) for i in range(args.light_users)])
+        return {group: {**summarize(latencies.get(group, [])), "rejected": rejected.get(group, 0)}
+                for group in ("light students", "heavy student", "batch parsing")}
+
+    results = {"fifo": asyncio.run(scenario(fair=False)), "fair": asyncio.run(scenario(fair=True))}
+    print(f"{'mode':<5} {'group':<15} {'done':>5} {'rejected':>9} {'p50 ms':>9} {'p99 ms':>9}")
+    for mode, groups in results.items():
+        for group, r in groups.items():
+            print(f"{mode:<5} {group:<15} {r['count']:>5} {r['rejected']:>9} {r['p50_ms']:>9.1f} {r['p99_ms']:>9.1f}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"meta": {"revision": git_revision(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                                "config": {k: v for k, v in vars(args).items() if k not in ("func", "out")}},
+                       "scheduler": results}, f, indent=2)
+        print(f"Results written to {args.out}")
+
+
+def compare(args):
+    with open(args.baseline) as f:
+        old = json.load(f)
+    with open(args.candidate) as f:
+        new = json.load(f)
+
+    regressions = []
+
+    def row(label: str, a: float, b: float, higher_is_better: bool = False):
+        change = ((b - a) / a * 100) if a else 0.0
+        worse = change < -args.threshold if higher_is_better else change > args.threshold
+        if worse:
+            regressions.append(label)
+        print(f"{label:<44} {a:>10.1f} -> {b:>10.1f} ({change:+6.1f}%){'  REGRESSION' if worse else ''}")
+
+    print(f"{old['meta']['revision']} -> {new['meta']['revision']}")
+    if "throughput" in old and "throughput" in new:
+        row("sessions/s", old["throughput"]["sessions_per_s"], new["throughput"]["sessions_per_s"], True)
+        row("http req/s", old["throughput"]["http_requests_per_s"], new["throughput"]["http_requests_per_s"], True)
+        for section in ("websocket_events_ms", "http_ms"):
+            for name in sorted(set(old.get(section, {})) & set(new.get(section, {}))):
+                for pct in ("p50_ms", "p99_ms"):
+                    row(f"{section.split('_')[0]} {name} {pct}", old[section][name][pct], new[section][name][pct])
+        for pct in ("p50_ms", "p99_ms"):
+            row(f"event loop lag {pct}", old["event_loop_lag_ms"][pct], new["event_loop_lag_ms"][pct])
+    for priority in sorted(set(old.get("llm_queue", {})) & set(new.get("llm_queue", {}))):
+        for pct in ("wait_p50_ms", "wait_p99_ms"):
+            row(f"llm queue {priority} {pct}", old["llm_queue"][priority][pct], new["llm_queue"][priority][pct])
+    for agent in sorted(set(old.get("agents", {})) & set(new.get("agents", {}))):
+        row(f"{agent} fallback %", old["agents"][agent]["fallback_rate"] * 100, new["agents"][agent]["fallback_rate"] * 100)
+        row(f"{agent} LLM calls / agent call", old["agents"][agent]["llm_calls"] / max(old["agents"][agent]["calls"], 1),
+            new["agents"][agent]["llm_calls"] / max(new["agents"][agent]["calls"], 1))
+    for app in sorted(set(old.get("coldstart", {})) & set(new.get("coldstart", {}))):
+        for metric in ("import_ms", "first_request_ms"):
+            row(f"{app} {metric} p50", old["coldstart"][app][metric]["p50_ms"], new["coldstart"][app][metric]["p50_ms"])
+
+    if regressions:
+        print(f"{len(regressions)} metric(s) regressed by more than {args.threshold}%")
+        sys.exit(1)
+
+
+def sample_session(snapshot, resume_text: str) -> List[List[Dict]]:
+    """
+    Events of one match session, grouped the way the worker emits them
+    back-to-back (one group per step between awaits).
+    """
+    import gemini_service
+
+    async def run_agents():
+        return (await gemini_service.generate_student_artifact(resume_text),
+                await gemini_service.rank_jobs(resume_text, snapshot.jobs, snapshot.jobs_json))
+
+    artifact, ranked = asyncio.run(run_agents())
+    jobs = [{**snapshot.by_id[m["id"]], **{k: v for k, v in m.items() if k != "id"}} for m in ranked][:30]
+
+    groups = [[{"status": "queued"}], [{"status": "thinking", "message": "Analyzing resume with Gemini AI..."}],
+              [{"status": "artifact", "data": artifact}], [{"status": "ranked", "jobs": jobs}]]
+    for i, job in enumerate(jobs[:10]):
+        groups.append([{"status": "tailoring", "job_id": job["id"], "job_title": job["title"]}])
+        groups.append([{"status": "auditing", "job_id": job["id"]}])
+        if i == 2:
+            groups.append([{"status": "violation", "job_id": job["id"], "reason": "Fabricated skills.",
+                            "details": ["Quantum Blockchain AI", "Neural Link Surgery"]}])
+        else:
+            groups.append([{"status": "applying", "job_id": job["id"]}])
+            groups.append([{"status": "applied", "job_id": job["id"]}])
+    groups.append([{"status": "complete", "message": "Applications processed. Check status for violations."}])
+
+    offset = 0
+    for group in groups:
+        for event in group:
+            event.update(session_id="0" * 32, offset=offset)
+            offset += 1
+    return groups
+
+
+def deflated_size(frames: List[str]) -> int:
+    """Bytes on the wire with permessage-deflate (context takeover, as negotiated by default)."""
+    import zlib
+
+    comp = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    # Each message ends with a sync flush whose 00 00 ff ff trailer is stripped.
+    return sum(len(comp.compress(f.encode()) + comp.flush(zlib.Z_SYNC_FLUSH)) - 4 for f in frames)
+
+
+def protocol_bench(args):
+    import catalog
+    import seed
+    import stub_llm
+    import ws_protocol
+
+    stub_llm.install()
+    rows = [(i + 1, j.title, j.company, j.description, j.requirements)
+            for i, j in enumerate(seed.generate_jobs(args.jobs, random.Random(args.seed)))]
+    snapshot = catalog.CatalogSnapshot(rows)
+    groups = sample_session(snapshot, RESUMES[0])
+    events = [e for g in groups for e in g]
+
+    def stdlib_dumps(obj) -> str:
+        return json.dumps(obj)
+
+    modes = {
+        "v1 (json)": (ws_protocol.EventEncoder(1), stdlib_dumps, groups),
+        "v1 (fast)": (ws_protocol.EventEncoder(1), ws_protocol.dumps, groups),
+        "v2 live, stale catalog": (ws_protocol.EventEncoder(2, 0), ws_protocol.dumps, groups),
+        "v2 live": (ws_protocol.EventEncoder(2, snapshot.version), ws_protocol.dumps, groups),
+        "v2 replay": (ws_protocol.EventEncoder(2, snapshot.version), ws_protocol.dumps, [events]),
+    }
+    results = {}
+    for name, (encoder, dumps, batches) in modes.items():
+        original = ws_protocol.dumps
+        ws_protocol.dumps = dumps
+        try:
+            frames = [f for batch in batches for f in encoder.encode(batch, snapshot)]
+            start = time.perf_counter()
+            for _ in range(args.iterations):
+                for batch in batches:
+                    encoder.encode(batch, snapshot)
+            per_session_us = (time.perf_counter() - start) / args.iterations * 1e6
+        finally:
+            ws_protocol.dumps = original
+        results[name] = {
+            "frames": len(frames),
+            "payload_bytes": sum(len(f.encode()) for f in frames),
+            "deflated_bytes": deflated_size(frames),
+            "serialize_us_per_session": round(per_session_us, 1),
+        }
+
+    result = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "orjson": "orjson" in sys.modules,
+            "config": {"jobs": args.jobs, "iterations": args.iterations, "seed": args.seed},
+        },
+        "protocol": results,
+    }
+    print(f"{'mode':<26} {'frames':>6} {'payload B':>10} {'deflated B':>11} {'serialize us':>13}")
+    for name, r in results.items():
+        print(f"{name:<26} {r['frames']:>6} {r['payload_bytes']:>10} {r['deflated_bytes']:>11} {r['serialize_us_per_session']:>13}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"Results written to {args.out}")
+
+
+COLDSTART_APPS = {
+    # module -> path that proves the app can serve (GET /jobs needs the schema).
+    "main": "/jobs",
+    "index": "/",
+}
+
+
+def import_profile(app_dir: str, module: str, env: Dict, top: int = 8) -> List[Dict]:
+    """Slowest top-level imports of `module` according to `python -X importtime`."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=app_dir, env=env, capture_output=True, text=True)
+    packages = []
+    for line in proc.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2].rstrip()
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:  # imported directly by `module`
+            packages.append({"module": name.strip(), "cumulative_ms": round(int(parts[1]) / 1000, 1)})
+    return sorted(packages, key=lambda p: p["cumulative_ms"], reverse=True)[:top]
+
+
+def time_first_request(app_dir: str, module: str, path: str, port: int, env: Dict, timeout: float = 60) -> float:
+    """ms from spawning uvicorn until `path` first answers 200."""
+    import urllib.request
+
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", f"{module}:app", "--port", str(port), "--log-level", "warning"],
+                            cwd=app_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = start + timeout
+        while time.perf_counter() < deadline:
+            if proc.poll() is not None:
+                raise RuntimeError(f"uvicorn {module}:app exited with code {proc.returncode}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=1) as res:
+                    if res.status == 200:
+                        return (time.perf_counter() - start) * 1000
+            except OSError:
+                pass
+            time.sleep(0.005)
+        raise RuntimeError(f"uvicorn {module}:app did not answer {path} in time")
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def coldstart_bench(args):
+    """
+    Import time and time-to-first-request of each app, every run in a fresh
+    interpreter against a fresh database. Point --app-dir at another checkout's
+    backend/ to measure it with the same harness.
+    """
+    app_dir = os.path.abspath(args.app_dir or os.path.dirname(os.path.abspath(__file__)))
+    workdir = tempfile.mkdtemp(prefix="jobportal-coldstart-")
+    results = {}
+    for module, path in COLDSTART_APPS.items():
+        imports, first_requests = [], []
+        for i in range(args.repeat):
+            env = dict(os.environ)
+            env["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, f'{module}-{i}.db')}"
+            env.setdefault("GOOGLE_API_KEY", "coldstart-bench")
+            out = subprocess.check_output(
+                [sys.executable, "-c", f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"],
+                cwd=app_dir, env=env, text=True)
+            imports.append(float(out.strip().splitlines()[-1]) * 1000)
+            env["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, f'{module}-{i}-serve.db')}"
+            first_requests.append(time_first_request(app_dir, module, path, args.port, env))
+        results[module] = {
+            "import_ms": summarize(imports),
+            "first_request_ms": summarize(first_requests),
+            "slowest_imports": import_profile(app_dir, module, env),
+        }
+
+    result = {
+        "meta": {
+            "revision": git_revision(app_dir),
+            "app_dir": app_dir,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "config": {"repeat": args.repeat},
+        },
+        "coldstart": results,
+    }
+    print(f"{'app':<8} {'import p50 ms':>14} {'first request p50 ms':>21}")
+    for module, r in results.items():
+        print(f"{module:<8} {r['import_ms']['p50_ms']:>14.1f} {r['first_request_ms']['p50_ms']:>21.1f}")
+        for p in r["slowest_imports"][:3]:
+            print(f"{'':<8}   {p['module']:<36} {p['cumulative_ms']:>8.1f} ms")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"Results written to {args.out}")
+
+
+def add_stub_args(p: argparse.ArgumentParser):
+    p.add_argument("--latency-ms", type=float, default=50, help="Stub LLM base latency per call")
+    p.add_argument("--jitter-ms", type=float, default=20, help="Uniform jitter added to each call")
+    p.add_argument("--per-kchar-ms", type=float, default=0.5, help="Extra latency per 1000 prompt chars")
+    p.add_argument("--failure-rate", type=float, default=0.0, help="Probability a stub call raises")
+    p.add_argument("--truncate-rate", type=float, default=0.0, help="Probability a stub response is cut off")
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--port", type=int, default=8765)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_run = sub.add_parser("run", help="Seed a scratch DB, start the app and drive load against it")
+    add_stub_args(p_run)
+    p_run.add_argument("--jobs", type=int, default=500, help="Jobs to seed")
+    p_run.add_argument("--students", type=int, default=200, help="Student accounts to seed")
+    p_run.add_argument("--sessions", type=int, default=200, help="Total /ws/match sessions")
+    p_run.add_argument("--concurrency", type=int, default=200, help="Concurrent /ws/match sessions")
+    p_run.add_argument("--http-workers", type=int, default=8, help="Concurrent HTTP request loops")
+    p_run.add_argument("--post-jobs", action="store_true",
+                       help="Also POST /jobs from the HTTP loops (exercises incremental matching)")
+    p_run.add_argument("--duration", type=float, default=10, help="HTTP-only duration when --sessions 0")
+    p_run.add_argument("--reconnect-rate", type=float, default=0.0,
+                       help="Fraction of sessions that drop after the artifact and resume by offset")
+    p_run.add_argument("--protocol", type=int, default=1, choices=(1, 2), help="/ws/match wire protocol")
+    p_run.add_argument("--llm-rpm", type=float, default=0, help="LLM_RPM for the server (0 = no limit)")
+    p_run.add_argument("--llm-tpm", type=float, default=0, help="LLM_TPM for the server (0 = no limit)")
+    p_run.add_argument("--pause-scale", type=float, default=0.0, help="UI_PAUSE_SCALE for the server")
+    p_run.add_argument("--timeout", type=float, default=120, help="Per-message / per-request timeout (s)")
+    p_run.add_argument("--out", default="bench_results", help="Output file or directory")
+    p_run.set_defaults(func=run)
+
+    p_cmp = sub.add_parser("compare", help="Diff two result files")
+    p_cmp.add_argument("baseline")
+    p_cmp.add_argument("candidate")
+    p_cmp.add_argument("--threshold", type=float, default=10.0, help="Regression threshold in percent")
+    p_cmp.set_defaults(func=compare)
+
+    p_proto = sub.add_parser("protocol", help="Offline bandwidth / serialization numbers for /ws/match protocols")
+    p_proto.add_argument("--jobs", type=int, default=500, help="Catalog size")
+    p_proto.add_argument("--iterations", type=int, default=200, help="Encodings per mode for timing")
+    p_proto.add_argument("--seed", type=int, default=42)
+    p_proto.add_argument("--out", default=None, help="Optional JSON output file")
+    p_proto.set_defaults(func=protocol_bench)
+
+    p_agents = sub.add_parser("agents", help="Fallback rates of the agents with truncated / failing LLM responses")
+    p_agents.add_argument("--jobs", type=int, default=500, help="Catalog size")
+    p_agents.add_argument("--iterations", type=int, default=200, help="Calls per agent")
+    p_agents.add_argument("--truncate-rate", type=float, default=0.2, help="Probability a stub response is cut off")
+    p_agents.add_argument("--failure-rate", type=float, default=0.05, help="Probability a stub call raises")
+    p_agents.add_argument("--seed", type=int, default=42)
+    p_agents.add_argument("--out", default=None, help="Optional JSON output file")
+    p_agents.set_defaults(func=agents_bench)
+
+    p_sched = sub.add_parser("scheduler", help="Queue wait per user group under an RPM limit, fair vs FIFO")
+    p_sched.add_argument("--rpm", type=float, default=600)
+    p_sched.add_argument("--burst-seconds", type=float, default=2, help="Token bucket size in seconds of quota")
+    p_sched.add_argument("--latency-ms", type=float, default=50, help="Duration of each simulated LLM call")
+    p_sched.add_argument("--heavy-calls", type=int, default=120, help="Calls the heavy student fires at once")
+    p_sched.add_argument("--batch-calls", type=int, default=40, help="Batch resume parses fired at once")
+    p_sched.add_argument("--light-users", type=int, default=10)
+    p_sched.add_argument("--light-calls", type=int, default=3, help="Sequential calls per light student")
+    p_sched.add_argument("--light-delay-ms", type=float, default=100, help="When light students arrive")
+    p_sched.add_argument("--per-user", type=int, default=1000, help="Per-user queue limit")
+    p_sched.add_argument("--max-queue", type=int, default=1000, help="Per-class queue limit")
+    p_sched.add_argument("--max-wait", type=float, default=120)
+    p_sched.add_argument("--out", default=None, help="Optional JSON output file")
+    p_sched.set_defaults(func=scheduler_bench)
+
+    p_cold = sub.add_parser("coldstart", help="Import time and time-to-first-request of main:app and index:app")
+    p_cold.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per app")
+    p_cold.add_argument("--app-dir", default=None, help="backend/ directory to measure (default: this one)")
+    p_cold.add_argument("--port", type=int, default=8766)
+    p_cold.add_argument("--out", default=None, help="Optional JSON output file")
+    p_cold.set_defaults(func=coldstart_bench)
+
+    p_serve = sub.add_parser("serve", help=argparse.SUPPRESS)
+    add_stub_args(p_serve)
+    p_serve.set_defaults(func=serve)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Employer-side candidate search over persisted student artifacts.
+
+Profile Agent output is stored per student (`student_artifacts`), its tags are
+written to an inverted index (`artifact_tags`, indexed on name/category) and
+its achievements to an SQLite FTS5 table (`artifact_fts`). Searches only touch
+the index entries for the requested tags / terms, so cost follows the number
+of matching candidates rather than the total number of profiles; tag hits and
+term matches are each materialized once and joined, and the total is counted
+from that join.
+"""
+import json
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import Float, Integer, and_, distinct, func, literal, or_, select, text
+from sqlalchemy.orm import Session
+
+import models
+
+
+def _normalize(name: str) -> str:
+    return " ".join(name.lower().split())
+
+
+def save_artifact(db: Session, student_id: int, artifact: Dict):
+    """Upserts a student's artifact and refreshes its index entries; canned fallback output is skipped."""
+    if artifact.get("fallback"):
+        return
+    tags = [t for t in artifact.get("tags", []) if t.get("name")]
+    achievements = [a for a in artifact.get("achievements", []) if isinstance(a, str)]
+
+    row = db.get(models.StudentArtifact, student_id)
+    if row is None:
+        row = models.StudentArtifact(student_id=student_id)
+        db.add(row)
+    row.tags = json.dumps(tags)
+    row.achievements = json.dumps(achievements)
+
+    db.query(models.ArtifactTag).filter(models.ArtifactTag.student_id == student_id).delete(synchronize_session=False)
+    seen = set()
+    for t in tags:
+        key = (_normalize(t["name"]), t.get("category", "others"))
+        if key not in seen:
+            seen.add(key)
+            db.add(models.ArtifactTag(student_id=student_id, name=key[0], category=key[1]))
+
+    db.execute(text("DELETE FROM artifact_fts WHERE rowid = :id"), {"id": student_id})
+    db.execute(text("INSERT INTO artifact_fts(rowid, achievements) VALUES (:id, :body)"),
+               {"id": student_id, "body": "\n".join(achievements)})
+    db.commit()
+
+
+def _fts_query(q: str) -> str:
+    # Quote every term so user input can't inject FTS5 syntax; terms are ANDed.
+    return " ".join('"' + term.replace('"', '""') + '"' for term in q.split())
+
+
+def _parse_tag(tag: str) -> Tuple[Optional[str], str]:
+    """'ml_ai:pytorch' -> ('ml_ai', 'pytorch'); 'python' -> (None, 'python')."""
+    category, sep, name = tag.partition(":")
+    return (category, _normalize(name)) if sep else (None, _normalize(tag))
+
+
+def search(db: Session, tags: List[str], categories: List[str], q: Optional[str] = None,
+           match_all: bool = False, page: int = 1, page_size: int = 20) -> Tuple[int, List[Dict]]:
+    """
+    Ranks candidates by how many requested tags they carry, then by BM25
+    relevance of `q` against their achievements.
+
+    tags:       tag names, optionally qualified by category ("ml_ai:pytorch").
+    categories: restrict tag matches to these categories; on their own they
+                match any candidate with a tag in one of them.
+    match_all:  require every requested tag instead of any.
+    """
+    T = models.ArtifactTag
+    parsed = [_parse_tag(t) for t in tags if t.strip()]
+
+    hits = None
+    if parsed or categories:
+        tag_filters = [and_(T.name == name, T.category == category) if category else T.name == name
+                       for category, name in parsed]
+        where = [or_(*tag_filters)] if tag_filters else []
+        if categories:
+            where.append(T.category.in_(categories))
+        counted = T.name if parsed else T.id
+        hits = (
+            select(T.student_id.label("student_id"), func.count(distinct(counted)).label("score"))
+            .where(*where)
+            .group_by(T.student_id)
+        )
+        if match_all and parsed:
+            hits = hits.having(func.count(distinct(T.name)) >= len({name for _, name in parsed}))
+        hits = hits.cte("hits").prefix_with("MATERIALIZED")
+
+    fts = None
+    if q and q.strip():
+        fts = (
+            text("SELECT rowid AS student_id, bm25(artifact_fts) AS rank FROM artifact_fts WHERE artifact_fts MATCH :q")
+            .bindparams(q=_fts_query(q))
+            .columns(student_id=Integer, rank=Float)
+            .cte("fts")
+            .prefix_with("MATERIALIZED")
+        )
+
+    if hits is not None and fts is not None:
+        ranked = (
+            select(hits.c.student_id, hits.c.score, fts.c.rank)
+            .join(fts, fts.c.student_id == hits.c.student_id)
+            .order_by(hits.c.score.desc(), fts.c.rank, hits.c.student_id)
+        )
+    elif hits is not None:
+        ranked = select(hits.c.student_id, hits.c.score).order_by(hits.c.score.desc(), hits.c.student_id)
+    elif fts is not None:
+        ranked = select(fts.c.student_id, literal(0).label("score")).order_by(fts.c.rank)
+    else:
+        A = models.StudentArtifact
+        ranked = select(A.student_id, literal(0).label("score")).order_by(A.updated_at.desc(), A.student_id.desc())
+
+    if hits is None and fts is None:
+        total = db.execute(select(func.count()).select_from(models.StudentArtifact)).scalar()
+        page_rows = db.execute(ranked.offset((page - 1) * page_size).limit(page_size)).all()
+    else:
+        # Both sides are materialized once and the total is counted over the
+        # same join the page is cut from, instead of re-running it for a count.
+        page_rows = db.execute(
+            ranked.add_columns(func.count().over().label("total")).offset((page - 1) * page_size).limit(page_size)
+        ).all()
+        if page_rows:
+            total = page_rows[0].total
+        elif page > 1:
+            total = db.execute(select(func.count()).select_from(ranked.order_by(None).subquery())).scalar()
+        else:
+            total = 0
+
+    ids = [r.student_id for r in page_rows]
+    artifacts = {
+        a.student_id: a for a in db.query(models.StudentArtifact).filter(models.StudentArtifact.student_id.in_(ids))
+    }
+    usernames = dict(db.query(models.User.id, models.User.username).filter(models.User.id.in_(ids)).all())
+
+    results = []
+    for r in page_rows:
+        artifact = artifacts.get(r.student_id)
+        if artifact is None:
+            continue
+        results.append({
+            "student_id": r.student_id,
+            "username": usernames.get(r.student_id, ""),
+            "tags": json.loads(artifact.tags),
+            "achievements": json.loads(artifact.achievements),
+            "score": r.score,
+        })
+    return total, results
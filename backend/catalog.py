@@ -0,0 +1,184 @@
+"""
+Read-optimized, versioned snapshot of the job catalog.
+
+Match sessions used to run `db.query(models.Job).all()` and copy every ORM row
+into dicts per session. Instead, the catalog is loaded once into one list of
+dicts with interned strings (seeded postings repeat a lot of text); the id map
+and the JSON form the Recruiter agent needs are derived from it on first use. A
+snapshot is immutable; `invalidate()` rebuilds and publishes a new one and
+swaps it in atomically. A snapshot's version is a hash of its contents, so it
+only changes when the jobs do and every process agrees on it, across restarts
+too.
+
+Across uvicorn worker processes, set CATALOG_SHARED_PATH to publish every
+snapshot to a memory-mapped file. Other processes notice the new file with a
+stat() per read and load it from the mapping instead of querying the DB. With
+no shared path, each process re-reads the DB after CATALOG_MAX_AGE seconds, so
+postings made through another worker still show up.
+
+Building a snapshot loads the whole table; code on the event loop uses
+`get_snapshot_async()`, which does that in a worker thread.
+"""
+import asyncio
+import hashlib
+import json
+import marshal
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import models
+from database import SessionLocal
+
+CATALOG_SHARED_PATH = os.getenv("CATALOG_SHARED_PATH")
+CATALOG_MAX_AGE = float(os.getenv("CATALOG_MAX_AGE", 30))
+
+_MAGIC = b"JCAT"
+_HEADER = struct.Struct("<4sQQ")  # magic, version, payload length
+
+
+FIELDS = ("id", "title", "company", "description", "requirements")
+
+
+class CatalogSnapshot:
+    """Immutable view of every job. Treat the returned lists/dicts as read-only."""
+    __slots__ = ("version", "jobs", "built_at", "_by_id", "_jobs_json")
+
+    def __init__(self, rows: List[Tuple]):
+        rows = [(r[0], *(sys.intern(v or "") for v in r[1:])) for r in rows]
+        # 48 bits: still an exact integer once it reaches the browser as a JS number.
+        digest = hashlib.blake2b(digest_size=6)
+        for row in rows:
+            digest.update(repr(row).encode())
+        self.version = int.from_bytes(digest.digest(), "big")
+        self.jobs = [dict(zip(FIELDS, row)) for row in rows]
+        self.built_at = time.monotonic()
+        self._by_id: Optional[Dict[int, Dict]] = None
+        self._jobs_json: Optional[str] = None
+
+    @property
+    def by_id(self) -> Dict[int, Dict]:
+        if self._by_id is None:
+            self._by_id = {j["id"]: j for j in self.jobs}
+        return self._by_id
+
+    @property
+    def jobs_json(self) -> str:
+        if self._jobs_json is None:
+            self._jobs_json = json.dumps(self.jobs)
+        return self._jobs_json
+
+    def rows(self) -> List[Tuple]:
+        return [tuple(j[f] for f in FIELDS) for j in self.jobs]
+
+
+_lock = threading.Lock()
+_current: Optional[CatalogSnapshot] = None
+_stale = False
+_invalidations = 0
+_shared_stat: Optional[Tuple[int, int]] = None
+
+
+def _load_rows() -> List[Tuple]:
+    db = SessionLocal()
+    try:
+        return db.query(models.Job.id, models.Job.title, models.Job.company,
+                        models.Job.description, models.Job.requirements).order_by(models.Job.id).all()
+    finally:
+        db.close()
+
+
+def _file_id(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns
+
+
+def _shared_version(path: str) -> int:
+    with open(path, "rb") as f:
+        magic, version, _ = _HEADER.unpack(f.read(_HEADER.size))
+    return version if magic == _MAGIC else 0
+
+
+def _read_shared(path: str) -> Optional[CatalogSnapshot]:
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        magic, _, length = _HEADER.unpack_from(mm, 0)
+        if magic != _MAGIC:
+            return None
+        rows = marshal.loads(mm[_HEADER.size:_HEADER.size + length])
+    return CatalogSnapshot(rows)
+
+
+def _write_shared(path: str, snapshot: CatalogSnapshot):
+    payload = marshal.dumps(snapshot.rows())
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, snapshot.version, len(payload)))
+        f.write(payload)
+    # Readers keep their mapping of the old inode; rename makes the swap atomic.
+    os.replace(tmp, path)
+
+
+def _build() -> CatalogSnapshot:
+    global _shared_stat
+    snapshot = CatalogSnapshot(_load_rows())
+    if CATALOG_SHARED_PATH:
+        # An idle refresh that found the same jobs leaves the file alone, so
+        # other processes don't reload an identical catalog.
+        if _file_id(CATALOG_SHARED_PATH) is None or _shared_version(CATALOG_SHARED_PATH) != snapshot.version:
+            _write_shared(CATALOG_SHARED_PATH, snapshot)
+        _shared_stat = _file_id(CATALOG_SHARED_PATH)
+    return snapshot
+
+
+def _needs_refresh() -> bool:
+    if _current is None or _stale:
+        return True
+    if CATALOG_SHARED_PATH and _file_id(CATALOG_SHARED_PATH) != _shared_stat:
+        return True
+    return time.monotonic() - _current.built_at > CATALOG_MAX_AGE
+
+
+def get_snapshot() -> CatalogSnapshot:
+    global _current, _stale, _shared_stat
+    if not _needs_refresh():
+        return _current
+    with _lock:
+        if not _needs_refresh():
+            return _current
+        generation = _invalidations
+        shared = _file_id(CATALOG_SHARED_PATH) if CATALOG_SHARED_PATH else None
+        snapshot = None
+        if shared is not None and shared != _shared_stat and not _stale:
+            # Another process published a newer catalog; map it instead of hitting the DB.
+            snapshot = _read_shared(CATALOG_SHARED_PATH)
+            _shared_stat = shared
+        _current = snapshot or _build()
+        # An invalidate() that raced with the build keeps the catalog stale.
+        _stale = _invalidations != generation
+        return _current
+
+
+async def get_snapshot_async() -> CatalogSnapshot:
+    """get_snapshot() for the event loop: a rebuild runs in a worker thread."""
+    if not _needs_refresh():
+        return _current
+    return await asyncio.to_thread(get_snapshot)
+
+
+def invalidate():
+    """
+    Rebuilds and publishes the catalog after a job is created/changed in this
+    process, so other workers pick it up right away. Blocks on the DB: call it
+    from a thread (e.g. a sync endpoint), not from the event loop.
+    """
+    global _stale, _invalidations
+    _invalidations += 1
+    _stale = True
+    get_snapshot()
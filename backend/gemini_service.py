@@ -1,16 +1,92 @@
 from dotenv import load_dotenv
+import asyncio
 import os
 import json
-import google.generativeai as genai
-import re
-from typing import List, Dict
+import threading
+from typing import List, Dict, Literal, Optional
+
+from pydantic import BaseModel, Field
+
+import llm_scheduler
+import structured_output
+from structured_output import stats
 
 load_dotenv()
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-genai.configure(api_key=GEMINI_API_KEY)
 
-# Using gemini-1.5-flash as the default for better availability
-model = genai.GenerativeModel('gemini-1.5-flash')
+# Built on first use: importing google.generativeai and configuring it is the
+# slowest part of starting the app, and most imports (tests, seeding, migrations)
+# never call the model.
+_model = None
+_model_lock = threading.Lock()
+
+def get_model():
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                import google.generativeai as genai
+                genai.configure(api_key=GEMINI_API_KEY)
+                # Using gemini-1.5-flash as the default for better availability
+                _model = genai.GenerativeModel('gemini-1.5-flash')
+    return _model
+
+def set_model(model):
+    """Replaces the Gemini model, e.g. with stub_llm.StubLLM for offline runs."""
+    global _model
+    _model = model
+
+# Follow-up calls allowed per agent call to fill in items missing from a
+# truncated or partly invalid response.
+REPAIR_CALLS = int(os.getenv("LLM_REPAIR_CALLS", 1))
+RANK_LIMIT = 30
+ACHIEVEMENT_COUNT = 5
+
+class ProfileTag(BaseModel):
+    name: str = Field(min_length=1)
+    category: Literal["languages", "ml_ai", "frameworks", "others"]
+
+class ProfileArtifact(BaseModel):
+    tags: List[ProfileTag]
+    achievements: List[str]
+
+class RankedJob(BaseModel):
+    id: int
+    match_score: int = Field(ge=0, le=100)
+    reasoning: str
+    interview_questions: List[str]
+    missing_skills: List[str]
+
+class AuditResult(BaseModel):
+    safety_status: Literal["PASS", "FAIL"]
+    violations: List[str] = []
+    explanation: str = "No explanation provided."
+
+PROFILE_SCHEMA = structured_output.gemini_schema(ProfileArtifact)
+RANKING_SCHEMA = structured_output.gemini_schema(List[RankedJob])
+AUDIT_SCHEMA = structured_output.gemini_schema(AuditResult)
+
+async def _generate(agent: str, prompt: str, schema: Dict, propagate_rejection: bool = False) -> Optional[str]:
+    """
+    One schema-constrained call through the quota scheduler; None if it failed
+    or was rejected. With `propagate_rejection`, a call the scheduler rejects
+    raises LLMQueueFull instead.
+    """
+    stats.incr(agent, "llm_calls")
+    try:
+        response = await llm_scheduler.submit(lambda: get_model().generate_content(prompt, generation_config={
+            "response_mime_type": "application/json",
+            "response_schema": schema,
+        }), prompt)
+        return response.text
+    except llm_scheduler.LLMQueueFull as e:
+        print(f"Gemini call rejected ({agent}): {e}")
+        if propagate_rejection:
+            raise
+        return None
+    except Exception as e:
+        print(f"Gemini API Error ({agent}): {e}")
+        return None
 
 PROFILE_SYSTEM_PROMPT = """
 You are 'The Profile Agent'. Your task is to extract a high-impact technical summary from a candidate's resume.
@@ -71,40 +147,49 @@ Return a JSON object:
 Be strict. If even one skill is hallucinated/fabricated, the status must be "FAIL".
 """
 
+# Common tech keywords to look for
+TECH_KEYWORDS = [
+    "python", "javascript", "react", "fastapi", "sql", "aws", "docker", 
+    "data science", "machine learning", "backend", "frontend", "devops",
+    "product manager", "analyst", "engineer", "java", "c++", "go"
+]
+
+def extract_keywords(resume_text: str) -> List[str]:
+    resume_lower = resume_text.lower()
+    return [kw for kw in TECH_KEYWORDS if kw in resume_lower]
+
+def keyword_score(resume_keywords: List[str], job: Dict):
+    """
+    Cheap local relevance score of one job: (score, matching keywords).
+    """
+    score = 0
+    matching_kws = []
+    
+    # Check title
+    title_lower = job["title"].lower()
+    for kw in resume_keywords:
+        if kw in title_lower:
+            score += 20
+            matching_kws.append(kw)
+    
+    # Check requirements
+    req_lower = job["requirements"].lower()
+    for kw in resume_keywords:
+        if kw in req_lower:
+            score += 15
+            if kw not in matching_kws:
+                matching_kws.append(kw)
+    return score, matching_kws
+
 def keyword_match_fallback(resume_text: str, jobs: List[Dict]) -> List[Dict]:
     """
     Robust fallback logic using keyword matching when Gemini API fails.
     """
-    resume_lower = resume_text.lower()
     results = []
-    
-    # Common tech keywords to look for
-    tech_keywords = [
-        "python", "javascript", "react", "fastapi", "sql", "aws", "docker", 
-        "data science", "machine learning", "backend", "frontend", "devops",
-        "product manager", "analyst", "engineer", "java", "c++", "go"
-    ]
-    
-    resume_keywords = [kw for kw in tech_keywords if kw in resume_lower]
+    resume_keywords = extract_keywords(resume_text)
     
     for j in jobs:
-        score = 0
-        matching_kws = []
-        
-        # Check title
-        title_lower = j["title"].lower()
-        for kw in resume_keywords:
-            if kw in title_lower:
-                score += 20
-                matching_kws.append(kw)
-        
-        # Check requirements
-        req_lower = j["requirements"].lower()
-        for kw in resume_keywords:
-            if kw in req_lower:
-                score += 15
-                if kw not in matching_kws:
-                    matching_kws.append(kw)
+        score, matching_kws = keyword_score(resume_keywords, j)
         
         # Add some randomness for variety
         score += (j["id"] % 20)
@@ -140,70 +225,142 @@ def keyword_match_fallback(resume_text: str, jobs: List[Dict]) -> List[Dict]:
     results.sort(key=lambda x: x["match_score"], reverse=True)
     return results[:30]
 
-def rank_jobs(resume_text: str, jobs: List[Dict]) -> List[Dict]:
-    # ... (rest of the rank_jobs function remains same, calling the updated prompt)
-    jobs_formatted = [{
-        "id": j["id"],
-        "title": j["title"],
-        "company": j["company"],
-        "description": j["description"],
-        "requirements": j["requirements"]
-    } for j in jobs]
+async def rank_jobs(resume_text: str, jobs: List[Dict], jobs_json: Optional[str] = None,
+              fallback: bool = True) -> Optional[List[Dict]]:
+    """
+    `jobs_json` is an optional pre-serialized job list (catalog.CatalogSnapshot.jobs_json)
+    so the whole catalog isn't re-encoded for every session.
+    With `fallback=False`, returns None instead of keyword-matched results when
+    the Recruiter produced nothing usable.
+    """
+    if jobs_json is None:
+        jobs_json = json.dumps([{
+            "id": j["id"],
+            "title": j["title"],
+            "company": j["company"],
+            "description": j["description"],
+            "requirements": j["requirements"]
+        } for j in jobs])
     
-    prompt = f"{RECRIUTER_SYSTEM_PROMPT}\n\nRESUME:\n{resume_text}\n\nJOBS:\n{json.dumps(jobs_formatted)}"
+    prompt = f"{RECRIUTER_SYSTEM_PROMPT}\n\nRESUME:\n{resume_text}\n\nJOBS:\n{jobs_json}"
     
-    try:
-        response = model.generate_content(prompt)
-        text = response.text
-        text = re.sub(r'```json\s*|\s*```', '', text).strip()
-        ranked_jobs = json.loads(text)
-        return ranked_jobs
-    except Exception as e:
-        print(f"Gemini API Error (Ranker): {e}. Falling back to keyword matching.")
-        return keyword_match_fallback(resume_text, jobs_formatted)
+    target = min(RANK_LIMIT, len(jobs))
+    job_ids = {j["id"] for j in jobs}
+    ranked: Dict[int, Dict] = {}
+    for attempt in range(1 + REPAIR_CALLS):
+        text = await _generate("ranker", prompt, RANKING_SCHEMA)
+        if attempt == 0 and (text is None or not structured_output.is_strict_json(text)):
+            stats.incr("ranker", "strict_failures")
+        if text is None:
+            break
+        data, complete = structured_output.loads(text)
+        valid, invalid = structured_output.validate_items(RankedJob, data)
+        for item in valid:
+            if item.id in job_ids and item.id not in ranked:
+                ranked[item.id] = item.model_dump()
+        if attempt > 0:
+            stats.incr("ranker", "repair_calls")
+        elif not complete or invalid:
+            stats.incr("ranker", "salvaged_items", len(ranked))
+        if (complete and not invalid) or len(ranked) >= target:
+            break
+        # Re-request only the rest: the jobs that aren't ranked yet.
+        remaining = [{k: j[k] for k in ("id", "title", "company", "description", "requirements")}
+                     for j in jobs if j["id"] not in ranked]
+        prompt = (f"{RECRIUTER_SYSTEM_PROMPT}\n\nRESUME:\n{resume_text}\n\n"
+                  f"Return only the top {target - len(ranked)} of these jobs.\n\nJOBS:\n{json.dumps(remaining)}")
+
+    if not ranked:
+        stats.incr("ranker", "fallback")
+        if not fallback:
+            return None
+        print("Ranker returned no usable matches. Falling back to keyword matching.")
+        # Scores every job in the catalog: keep it off the event loop.
+        return await asyncio.to_thread(keyword_match_fallback, resume_text, jobs)
+    stats.incr("ranker", "ok" if attempt == 0 and complete and not invalid else "repaired")
+    return sorted(ranked.values(), key=lambda m: m["match_score"], reverse=True)[:RANK_LIMIT]
 
-def audit_application(original_resume: str, tailored_text: str) -> Dict:
-    # ... (rest of audit_application remains same)
+async def audit_application(original_resume: str, tailored_text: str) -> Optional[Dict]:
+    # An audit that never ran must not pass: None when the call failed or gave no
+    # usable verdict, LLMQueueFull if the scheduler rejected it (worth retrying).
     prompt = f"{AUDITOR_SYSTEM_PROMPT}\n\nORIGINAL RESUME:\n{original_resume}\n\nTAILORED APPLICATION:\n{tailored_text}"
     
-    try:
-        response = model.generate_content(prompt)
-        text = response.text
-        text = re.sub(r'```json\s*|\s*```', '', text).strip()
-        return json.loads(text)
-    except Exception as e:
-        print(f"Gemini API Error (Auditor): {e}")
-        return {
-            "safety_status": "PASS",
-            "violations": [],
-            "explanation": "Audit passed via fallback (AI service unavailable)."
-        }
-
-def generate_student_artifact(resume_text: str) -> Dict:
+    for attempt in range(1 + REPAIR_CALLS):
+        text = await _generate("auditor", prompt, AUDIT_SCHEMA, propagate_rejection=True)
+        if attempt == 0 and (text is None or not structured_output.is_strict_json(text)):
+            stats.incr("auditor", "strict_failures")
+        if text is None:
+            break
+        if attempt > 0:
+            stats.incr("auditor", "repair_calls")
+        data, complete = structured_output.loads(text)
+        try:
+            # A truncated verdict is still usable once safety_status made it through.
+            result = AuditResult.model_validate(data)
+        except ValueError:
+            continue
+        stats.incr("auditor", "ok" if attempt == 0 and complete else "repaired")
+        return result.model_dump()
+
+    stats.incr("auditor", "fallback")
+    return None
+
+async def generate_student_artifact(resume_text: str) -> Dict:
     """
     Calls 'The Profile Agent' AI to extract achievements and skills.
     """
     prompt = f"{PROFILE_SYSTEM_PROMPT}\n\nRESUME TEXT:\n{resume_text}"
     
-    try:
-        response = model.generate_content(prompt)
-        text = response.text
-        text = re.sub(r'```json\s*|\s*```', '', text).strip()
-        return json.loads(text)
-    except Exception as e:
-        print(f"Gemini API Error (Profile Agent): {e}")
-        # Robust Fallback
-        return {
-            "tags": [
-                {"name": "Python", "category": "languages"},
-                {"name": "React", "category": "frameworks"},
-                {"name": "ML/AI", "category": "ml_ai"}
-            ],
-            "achievements": [
-                "Built and deployed scalable applications using modern stacks.",
-                "Optimized system performance and user experience.",
-                "Demonstrated strong problem-solving in technical challenges.",
-                "Collaborated on diverse software development projects.",
-                "Maintained high code quality and best practices."
-            ]
-        }
+    tags: Dict[str, Dict] = {}
+    achievements: List[str] = []
+    for attempt in range(1 + REPAIR_CALLS):
+        text = await _generate("profile", prompt, PROFILE_SCHEMA)
+        if attempt == 0 and (text is None or not structured_output.is_strict_json(text)):
+            stats.incr("profile", "strict_failures")
+        if text is None:
+            break
+        if attempt > 0:
+            stats.incr("profile", "repair_calls")
+        data, complete = structured_output.loads(text)
+        data = data if isinstance(data, dict) else {}
+        valid_tags, bad_tags = structured_output.validate_items(ProfileTag, data.get("tags"))
+        for tag in valid_tags:
+            tags.setdefault(tag.name.lower(), tag.model_dump())
+        for item in data.get("achievements") or []:
+            if isinstance(item, str) and item.strip() and item not in achievements and len(achievements) < ACHIEVEMENT_COUNT:
+                achievements.append(item)
+        if attempt == 0 and (not complete or bad_tags):
+            stats.incr("profile", "salvaged_items", len(tags) + len(achievements))
+        if tags and len(achievements) >= ACHIEVEMENT_COUNT:
+            break
+        # Re-request only what's missing, listing what we already have.
+        missing = []
+        if not tags:
+            missing.append("tags")
+        if len(achievements) < ACHIEVEMENT_COUNT:
+            missing.append(f"{ACHIEVEMENT_COUNT - len(achievements)} more achievements (different from the ones below)")
+        prompt = (f"{PROFILE_SYSTEM_PROMPT}\n\nAlready extracted: {json.dumps({'tags': list(tags.values()), 'achievements': achievements})}\n"
+                  f"Return the same JSON object containing only {' and '.join(missing)}.\n\nRESUME TEXT:\n{resume_text}")
+
+    if tags or achievements:
+        first_try = attempt == 0 and complete and not bad_tags
+        stats.incr("profile", "ok" if first_try else "repaired")
+        return {"tags": list(tags.values()), "achievements": achievements}
+
+    stats.incr("profile", "fallback")
+    # Robust Fallback; marked so it is shown but never indexed as the student's profile.
+    return {
+        "fallback": True,
+        "tags": [
+            {"name": "Python", "category": "languages"},
+            {"name": "React", "category": "frameworks"},
+            {"name": "ML/AI", "category": "ml_ai"}
+        ],
+        "achievements": [
+            "Built and deployed scalable applications using modern stacks.",
+            "Optimized system performance and user experience.",
+            "Demonstrated strong problem-solving in technical challenges.",
+            "Collaborated on diverse software development projects.",
+            "Maintained high code quality and best practices."
+        ]
+    }
@@ -0,0 +1,117 @@
+"""
+Incremental matching of newly posted jobs.
+
+`POST /jobs` enqueues a `score_new_job` task. The task scores only the new job
+against the cached resume representation of each active or recently seen
+student (cheap keyword scorer), asks the Recruiter agent about the ones that
+clear the threshold, and appends a `new_match` event to that student's latest
+match session so connected dashboards see it immediately. Cost per posting is
+O(active students); nobody gets a full re-rank.
+"""
+import asyncio
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from sqlalchemy.orm import Session
+
+import gemini_service
+import llm_scheduler
+import match_sessions
+import models
+import task_queue
+from database import run_in_thread
+
+# Students whose latest session was touched within this window count as active.
+ACTIVE_STUDENT_TTL = int(os.getenv("ACTIVE_STUDENT_TTL", 2 * 60 * 60))
+# Local keyword score a job needs before the Recruiter agent is consulted.
+LOCAL_SCORE_THRESHOLD = int(os.getenv("NEW_MATCH_LOCAL_THRESHOLD", 35))
+# Recruiter match_score needed to push a new_match event.
+MATCH_SCORE_THRESHOLD = int(os.getenv("NEW_MATCH_SCORE_THRESHOLD", 60))
+# Concurrent Recruiter calls per posting.
+LLM_CONCURRENCY = int(os.getenv("NEW_MATCH_LLM_CONCURRENCY", 4))
+
+# session_id -> resume keywords; sessions are immutable, so entries never go stale.
+_representations: Dict[str, List[str]] = {}
+
+
+def active_sessions(db: Session):
+    """Latest session per student touched within ACTIVE_STUDENT_TTL."""
+    cutoff = datetime.utcnow() - timedelta(seconds=ACTIVE_STUDENT_TTL)
+    # Range scan on ix_match_sessions_active (covering), so cost follows the
+    # number of recently active sessions rather than every session ever created.
+    recent = (
+        db.query(models.MatchSession.student_id, models.MatchSession.created_at, models.MatchSession.id)
+        .filter(models.MatchSession.updated_at >= cutoff)
+        .all()
+    )
+    latest: Dict[int, tuple] = {}
+    for r in recent:
+        if r.student_id not in latest or r.created_at > latest[r.student_id][0]:
+            latest[r.student_id] = (r.created_at, r.id)
+    ids = [session_id for _, session_id in latest.values()]
+    return (
+        db.query(models.MatchSession.id, models.MatchSession.student_id, models.MatchSession.resume_text)
+        .filter(models.MatchSession.id.in_(ids))
+        .all()
+    ) if ids else []
+
+
+def resume_keywords(session_id: str, resume_text: str) -> List[str]:
+    keywords = _representations.get(session_id)
+    if keywords is None:
+        keywords = _representations[session_id] = gemini_service.extract_keywords(resume_text)
+    return keywords
+
+
+def _load(db: Session, job_id: int):
+    job = db.get(models.Job, job_id)
+    if job is None:
+        return None, []
+    job_dict = {"id": job.id, "title": job.title, "company": job.company, "description": job.description, "requirements": job.requirements}
+    return job_dict, active_sessions(db)
+
+
+@task_queue.register("score_new_job")
+async def score_new_job(payload: Dict):
+    job_dict, sessions = await run_in_thread(_load, payload["job_id"])
+    if job_dict is None:
+        return
+
+    live = {s.id for s in sessions}
+    for stale in [sid for sid in _representations if sid not in live]:
+        del _representations[stale]
+
+    candidates = []
+    for s in sessions:
+        score, _ = gemini_service.keyword_score(resume_keywords(s.id, s.resume_text), job_dict)
+        if score >= LOCAL_SCORE_THRESHOLD:
+            candidates.append(s)
+
+    sem = asyncio.Semaphore(LLM_CONCURRENCY)
+
+    async def confirm(s):
+        async with sem:
+            with llm_scheduler.caller(f"student:{s.student_id}", "background"):
+                ranked = await gemini_service.rank_jobs(s.resume_text, [job_dict], jobs_json=None, fallback=False)
+        if ranked is None:
+            # No Recruiter verdict (outage / rejected): keyword scores aren't a confirmation.
+            return None
+        match = next((m for m in ranked if m.get("id") == job_dict["id"]), None)
+        if match is None or match.get("match_score", 0) < MATCH_SCORE_THRESHOLD:
+            return None
+        return s.id, match
+
+    confirmed = [c for c in await asyncio.gather(*(confirm(s) for s in candidates)) if c]
+    for session_id, match in confirmed:
+        await match_sessions.publish(session_id, [{
+            "status": "new_match",
+            "job": {
+                **job_dict,
+                "match_score": match.get("match_score", 0),
+                "reasoning": match.get("reasoning", "No reasoning provided."),
+                "interview_questions": match.get("interview_questions", []),
+                "missing_skills": match.get("missing_skills", [])
+            },
+        }])
+    print(f"New job {job_dict['id']}: {len(sessions)} active students, {len(candidates)} scored by LLM, {len(confirmed)} notified")
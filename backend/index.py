@@ -1,14 +1,21 @@
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Request
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field
 from typing import Optional, List
+import asyncio
+import math
 import os
+from functools import lru_cache
 from tempfile import NamedTemporaryFile
 import json
 
-from langchain_community.document_loaders import PDFPlumberLoader
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.output_parsers import PydanticOutputParser
+import llm_scheduler
+
+# langchain_community / pdfplumber / langchain_google_genai are imported where
+# they're used: together they take over a second to import and only the parse
+# endpoints need them. The endpoints reach them through worker threads
+# (parse_components, load_pdf_text) so the first request doesn't stall the
+# event loop on those imports.
 
 app = FastAPI(title="Resume Parser API", version="1.0.0")
 
@@ -32,8 +39,11 @@ class ResumeOutput(BaseModel):
     )
 
 
+@lru_cache(maxsize=1)
 def initialize_llm():
-    """Initialize the Gemini LLM"""
+    """Initialize the Gemini LLM once and reuse the client across requests"""
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
     api_key = os.getenv("GOOGLE_API_KEY")
     if not api_key:
         raise ValueError("GOOGLE_API_KEY environment variable not set")
@@ -45,6 +55,35 @@ def initialize_llm():
     )
 
 
+@lru_cache(maxsize=1)
+def resume_parser():
+    from langchain_core.output_parsers import PydanticOutputParser
+
+    return PydanticOutputParser(pydantic_object=ResumeOutput)
+
+
+async def parse_components():
+    """(parser, llm), built in a worker thread on first use."""
+    return await asyncio.to_thread(lambda: (resume_parser(), initialize_llm()))
+
+
+def load_pdf_text(path: str) -> Optional[str]:
+    from langchain_community.document_loaders import PDFPlumberLoader
+
+    documents = PDFPlumberLoader(path).load()
+    return documents[0].page_content if documents else None
+
+
+async def invoke_llm(request: Request, llm, prompt: str):
+    """Runs a parse through the shared LLM scheduler as batch work of the calling client."""
+    client = request.client.host if request.client else "anonymous"
+    with llm_scheduler.caller(f"client:{client}", "batch"):
+        try:
+            return await llm_scheduler.submit(lambda: llm.invoke(prompt), prompt)
+        except llm_scheduler.LLMQueueFull as e:
+            raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(math.ceil(e.retry_after))})
+
+
 @app.get("/")
 async def root():
     """Health check endpoint"""
@@ -53,6 +92,7 @@ async def root():
 
 @app.post("/parse-resume", response_model=ResumeOutput)
 async def parse_resume(
+    request: Request,
     resume: UploadFile = File(..., description="Resume PDF file"),
     linkedin_text: Optional[str] = Form(None, description="Optional LinkedIn profile text"),
     portfolio_links: Optional[str] = Form(None, description="Optional comma-separated portfolio links"),
@@ -81,17 +121,13 @@ async def parse_resume(
             tmp_file_path = tmp_file.name
         
         # Load PDF
-        loader = PDFPlumberLoader(tmp_file_path)
-        documents = loader.load()
+        resume_text = await asyncio.to_thread(load_pdf_text, tmp_file_path)
         
-        if not documents:
+        if resume_text is None:
             raise HTTPException(status_code=400, detail="Could not extract text from PDF")
         
-        resume_text = documents[0].page_content
-        
         # Initialize parser and LLM
-        parser = PydanticOutputParser(pydantic_object=ResumeOutput)
-        llm = initialize_llm()
+        parser, llm = await parse_components()
         
         # Build prompt
         prompt = f"""
@@ -119,26 +155,27 @@ Resume:
 """
         
         # Invoke LLM
-        raw = llm.invoke(prompt)
+        raw = await invoke_llm(request, llm, prompt)
         result = parser.invoke(raw)
         
-        # Clean up temp file
-        os.unlink(tmp_file_path)
-        
         return result
         
+    except HTTPException:
+        raise
     except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing resume: {str(e)}")
+    finally:
         # Clean up temp file if it exists
         if 'tmp_file_path' in locals():
             try:
                 os.unlink(tmp_file_path)
             except:
                 pass
-        raise HTTPException(status_code=500, detail=f"Error processing resume: {str(e)}")
 
 
 @app.post("/parse-resume-text")
 async def parse_resume_text(
+    request: Request,
     resume_text: str = Form(..., description="Resume text content"),
     linkedin_text: Optional[str] = Form(None),
     portfolio_links: Optional[str] = Form(None),
@@ -152,8 +189,7 @@ async def parse_resume_text(
     
     try:
         # Initialize parser and LLM
-        parser = PydanticOutputParser(pydantic_object=ResumeOutput)
-        llm = initialize_llm()
+        parser, llm = await parse_components()
         
         # Build prompt
         prompt = f"""
@@ -181,15 +217,19 @@ Resume:
 """
         
         # Invoke LLM
-        raw = llm.invoke(prompt)
+        raw = await invoke_llm(request, llm, prompt)
         result = parser.invoke(raw)
         
         return result
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing resume: {str(e)}")
 
 
+# Standalone parser for local development only. Deployed, main.py serves this
+# app under /parser so it shares the match sessions' LLM scheduler and quota.
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
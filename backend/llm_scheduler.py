@@ -0,0 +1,293 @@
+"""
+Shared admission control for every Gemini call (the agents in gemini_service
+and the resume parser in index).
+
+Calls wait in per-priority queues and are released against two token buckets
+sized to the provider quota: requests per minute (LLM_RPM) and tokens per
+minute (LLM_TPM); 0 disables a limit. Priority classes are served strictly in
+order (interactive match sessions, then background new-job scoring, then batch
+resume parsing) and, within a class, round-robin per user, so one user with
+many queued calls only gets their turn like everybody else.
+
+When a queue is already too deep the call is rejected up front with
+LLMQueueFull and a retry-after estimate instead of piling up behind the quota;
+a call that waits longer than LLM_MAX_WAIT is rejected the same way.
+
+Admission and waiting happen on the event loop: a queued call is a future, not
+a blocked thread. Only admitted calls run, on the scheduler's own pool of
+LLM_MAX_CONCURRENCY threads, and nothing is admitted while that pool is busy, so
+no thread-pool FIFO sits in front of the priority queues.
+
+Callers are identified through `caller(user, priority)`, which is carried by
+the awaiting task, so agent signatures don't change.
+
+Limits are per process. main.py mounts the resume parser (index.app), so one
+server process shares a single scheduler; with several uvicorn workers, split
+the provider quota between them.
+"""
+import asyncio
+import contextlib
+import contextvars
+import math
+import os
+import time
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+LLM_RPM = float(os.getenv("LLM_RPM", 1000))
+LLM_TPM = float(os.getenv("LLM_TPM", 4_000_000))
+# Bucket size in seconds of quota: how large a burst is let through at once.
+LLM_BURST_SECONDS = float(os.getenv("LLM_BURST_SECONDS", 10))
+# Calls allowed to wait per priority class / per user before new ones are rejected.
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", 256))
+LLM_MAX_BATCH_QUEUE = int(os.getenv("LLM_MAX_BATCH_QUEUE", 32))
+LLM_MAX_QUEUE_PER_USER = int(os.getenv("LLM_MAX_QUEUE_PER_USER", 8))
+LLM_MAX_WAIT = float(os.getenv("LLM_MAX_WAIT", 60))
+# Admitted calls in flight at once (threads in the scheduler's pool).
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 32))
+# Output tokens assumed per call until the response reports its real usage.
+OUTPUT_TOKEN_ESTIMATE = int(os.getenv("LLM_OUTPUT_TOKEN_ESTIMATE", 1024))
+
+PRIORITIES = ("interactive", "background", "batch")
+
+_caller: contextvars.ContextVar[Tuple[str, str]] = contextvars.ContextVar("llm_caller", default=("anonymous", "interactive"))
+
+
+class LLMQueueFull(Exception):
+    """The call was not admitted; try again after `retry_after` seconds."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@contextlib.contextmanager
+def caller(user: str, priority: str = "interactive"):
+    """Attributes LLM calls made inside the block to `user` at `priority`."""
+    token = _caller.set((user, priority))
+    try:
+        yield
+    finally:
+        _caller.reset(token)
+
+
+def estimate_tokens(prompt: str) -> int:
+    # ~4 characters per token for English text and JSON.
+    return len(prompt) // 4 + OUTPUT_TOKEN_ESTIMATE
+
+
+def _usage_tokens(result: Any) -> Optional[int]:
+    """Total tokens reported by a google.generativeai or langchain response."""
+    usage = getattr(result, "usage_metadata", None)
+    if usage is None:
+        return None
+    if isinstance(usage, dict):
+        return usage.get("total_tokens")
+    return getattr(usage, "total_token_count", None) or None
+
+
+class TokenBucket:
+    """`per_minute` tokens, refilled continuously; holds at most `burst_seconds` worth."""
+
+    def __init__(self, per_minute: float, burst_seconds: float = LLM_BURST_SECONDS):
+        self.rate = per_minute / 60
+        self.capacity = max(self.rate * burst_seconds, 1) if per_minute else 0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, n: float, now: float) -> float:
+        if not self.capacity:
+            return 0.0
+        self._refill(now)
+        return max(0.0, (n - self.tokens) / self.rate)
+
+    def take(self, n: float):
+        # May go negative when a response used more than estimated; later calls wait it off.
+        if self.capacity:
+            self._refill(time.monotonic())
+            self.tokens -= n
+
+
+class _Ticket:
+    __slots__ = ("user", "priority", "tokens", "enqueued", "granted")
+
+    def __init__(self, user: str, priority: str, tokens: int, granted: asyncio.Future):
+        self.user = user
+        self.priority = priority
+        self.tokens = tokens
+        self.enqueued = time.monotonic()
+        self.granted = granted
+
+
+class LLMScheduler:
+    """Not thread-safe: use it from one event loop."""
+
+    def __init__(self, rpm: float = LLM_RPM, tpm: float = LLM_TPM, max_queue: int = LLM_MAX_QUEUE,
+                 max_batch_queue: int = LLM_MAX_BATCH_QUEUE, max_queue_per_user: int = LLM_MAX_QUEUE_PER_USER,
+                 max_wait: float = LLM_MAX_WAIT, burst_seconds: float = LLM_BURST_SECONDS,
+                 max_concurrency: int = LLM_MAX_CONCURRENCY):
+        self.requests = TokenBucket(rpm, burst_seconds)
+        self.tokens = TokenBucket(tpm, burst_seconds)
+        self.max_queue = {"interactive": max_queue, "background": max_queue, "batch": max_batch_queue}
+        self.max_queue_per_user = max_queue_per_user
+        self.max_wait = max_wait
+        self.max_concurrency = max_concurrency
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm")
+        self._in_flight = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # priority -> user -> FIFO of that user's tickets; user order is the round-robin order.
+        self._queues: Dict[str, "OrderedDict[str, Deque[_Ticket]]"] = {p: OrderedDict() for p in PRIORITIES}
+        self._depth: Dict[str, int] = defaultdict(int)
+        self._user_depth: Dict[str, int] = defaultdict(int)
+        self._waits: Dict[str, Deque[float]] = {p: deque(maxlen=4096) for p in PRIORITIES}
+        self._counts: Dict[str, Dict[str, int]] = {p: defaultdict(int) for p in PRIORITIES}
+
+    # --- admission ---
+    def _retry_after(self) -> float:
+        queued = sum(self._depth.values()) + 1
+        per_second = self.requests.rate or 1.0
+        return float(max(1, math.ceil(queued / per_second)))
+
+    def _check(self, user: str, priority: str):
+        if self._depth[priority] >= self.max_queue[priority]:
+            raise LLMQueueFull(f"Too many queued {priority} LLM calls", self._retry_after())
+        if self._user_depth[user] >= self.max_queue_per_user:
+            raise LLMQueueFull(f"Too many queued LLM calls for {user}", self._retry_after())
+
+    def check_admission(self, user: str, priority: str = "interactive"):
+        """Raises LLMQueueFull if a call from `user` at `priority` would be rejected right now."""
+        try:
+            self._check(user, priority)
+        except LLMQueueFull:
+            self._counts[priority]["rejected"] += 1
+            raise
+
+    # --- queueing ---
+    def _head(self) -> Optional[_Ticket]:
+        for priority in PRIORITIES:
+            users = self._queues[priority]
+            if users:
+                return next(iter(users.values()))[0]
+        return None
+
+    def _remove(self, ticket: _Ticket):
+        users = self._queues[ticket.priority]
+        queue = users[ticket.user]
+        if queue[0] is ticket:
+            queue.popleft()
+            # Served: the user goes to the back of the round-robin.
+            users.move_to_end(ticket.user)
+        else:
+            queue.remove(ticket)
+        if not queue:
+            del users[ticket.user]
+        self._depth[ticket.priority] -= 1
+        self._user_depth[ticket.user] -= 1
+        if not self._user_depth[ticket.user]:
+            del self._user_depth[ticket.user]
+
+    def _dispatch(self):
+        """Grants head-of-line tickets while the quota and the thread pool allow."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._in_flight < self.max_concurrency:
+            ticket = self._head()
+            if ticket is None:
+                return
+            now = time.monotonic()
+            wait = max(self.requests.wait_time(1, now), self.tokens.wait_time(ticket.tokens, now))
+            if wait > 0:
+                self._timer = asyncio.get_running_loop().call_later(wait, self._dispatch)
+                return
+            self.requests.take(1)
+            self.tokens.take(ticket.tokens)
+            self._remove(ticket)
+            self._waits[ticket.priority].append((now - ticket.enqueued) * 1000)
+            self._counts[ticket.priority]["admitted"] += 1
+            self._in_flight += 1
+            ticket.granted.set_result(None)
+
+    def release(self, ticket: _Ticket, used: Optional[int] = None):
+        self._in_flight -= 1
+        if used:
+            self.tokens.take(used - ticket.tokens)
+        self._dispatch()
+
+    async def acquire(self, tokens: int, user: Optional[str] = None, priority: Optional[str] = None) -> _Ticket:
+        """Waits until a call is admitted under the quota; pair with `release`."""
+        ctx_user, ctx_priority = _caller.get()
+        user = user or ctx_user
+        priority = priority or ctx_priority
+        if self.tokens.capacity:
+            tokens = min(tokens, self.tokens.capacity)
+        self.check_admission(user, priority)
+
+        ticket = _Ticket(user, priority, tokens, asyncio.get_running_loop().create_future())
+        self._queues[priority].setdefault(user, deque()).append(ticket)
+        self._depth[priority] += 1
+        self._user_depth[user] += 1
+        self._dispatch()
+        try:
+            await asyncio.wait_for(asyncio.shield(ticket.granted), self.max_wait)
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            if ticket.granted.done():
+                self.release(ticket)
+            else:
+                self._remove(ticket)
+                self._dispatch()
+            raise
+        if not ticket.granted.done():
+            self._remove(ticket)
+            self._counts[priority]["timed_out"] += 1
+            self._dispatch()
+            raise LLMQueueFull(f"LLM call waited more than {self.max_wait:.0f}s", self._retry_after())
+        return ticket
+
+    async def submit(self, fn: Callable[[], Any], tokens: int, user: Optional[str] = None,
+                     priority: Optional[str] = None) -> Any:
+        """Waits until the call is admitted under the quota, then runs `fn()` on the scheduler's pool."""
+        ticket = await self.acquire(tokens, user, priority)
+        used = None
+        try:
+            result = await asyncio.get_running_loop().run_in_executor(self._executor, fn)
+            used = _usage_tokens(result)
+            return result
+        finally:
+            self.release(ticket, used)
+
+    # --- reporting ---
+    def metrics(self) -> Dict[str, Dict]:
+        """Queue depth, admitted/rejected/timed-out counts and queue wait per priority class."""
+        out = {}
+        for priority in PRIORITIES:
+            waits = sorted(self._waits[priority])
+
+            def pct(p: float) -> float:
+                return round(waits[min(len(waits) - 1, int(p / 100 * len(waits)))], 3) if waits else 0.0
+
+            out[priority] = {
+                "queued": self._depth[priority],
+                "admitted": self._counts[priority]["admitted"],
+                "rejected": self._counts[priority]["rejected"],
+                "timed_out": self._counts[priority]["timed_out"],
+                "wait_p50_ms": pct(50),
+                "wait_p99_ms": pct(99),
+                "wait_max_ms": round(waits[-1], 3) if waits else 0.0,
+            }
+        return out
+
+
+scheduler = LLMScheduler()
+
+
+async def submit(fn: Callable[[], Any], prompt: str) -> Any:
+    """Runs `fn` (one blocking LLM call for `prompt`) through the shared scheduler."""
+    return await scheduler.submit(fn, estimate_tokens(prompt))
@@ -1,23 +1,41 @@
-from fastapi import FastAPI, Depends, HTTPException, status, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, Depends, HTTPException, Query, Response, status, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-from typing import List
-import models, database, auth, gemini_service, asyncio, json
-from database import engine, get_db
-
-models.Base.metadata.create_all(bind=engine)
+from typing import List, Optional
+import models, database, auth, candidate_index, catalog, match_sessions, incremental_matcher, index, llm_scheduler, migrate, task_queue, ws_protocol, asyncio, json, os
+from database import get_db
 
 app = FastAPI(title="Job Portal API")
 
+# Number of match sessions processed concurrently by this process.
+MATCH_WORKERS = int(os.getenv("MATCH_WORKERS", 32))
+# Create the schema on startup; set to 0 when `python migrate.py` runs at deploy time.
+AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "1") != "0"
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Catalog-Version"],
 )
 
+# The resume parser (POST /parser/parse-resume, /parser/parse-resume-text) is served
+# by this process so its calls queue behind match sessions in the same LLM scheduler.
+app.mount("/parser", index.app)
+
+@app.on_event("startup")
+async def start_match_workers():
+    if AUTO_MIGRATE:
+        migrate.migrate()
+    task_queue.start_workers(MATCH_WORKERS)
+
+@app.on_event("shutdown")
+async def stop_match_workers():
+    await task_queue.stop_workers()
+
 async def get_current_user(token: str = Depends(auth.oauth2_scheme), db: Session = Depends(get_db)):
     payload = auth.decode_token(token)
     if payload is None:
@@ -57,9 +75,11 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.get("/jobs", response_model=List[models.JobOut])
-def get_jobs(db: Session = Depends(get_db)):
-    jobs = db.query(models.Job).all()
-    return jobs
+def get_jobs(response: Response):
+    snapshot = catalog.get_snapshot()
+    # Lets /ws/match protocol 2 clients receive ranked jobs by ID only.
+    response.headers["X-Catalog-Version"] = str(snapshot.version)
+    return snapshot.jobs
 
 @app.post("/jobs", response_model=models.JobOut)
 def create_job(job: models.JobCreate, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
@@ -70,12 +90,32 @@ def create_job(job: models.JobCreate, db: Session = Depends(get_db), current_use
     db.add(new_job)
     db.commit()
     db.refresh(new_job)
+    catalog.invalidate()
+    # Score the posting against active students in the background.
+    task_queue.enqueue(db, "score_new_job", {"job_id": new_job.id})
     return new_job
 
 @app.get("/me", response_model=models.UserOut)
 def get_me(current_user: models.User = Depends(get_current_user)):
     return current_user
 
+@app.get("/candidates", response_model=models.CandidatePage)
+def search_candidates(
+    tag: List[str] = Query([], description="Tag name, optionally category-qualified (ml_ai:pytorch). Repeatable."),
+    category: List[str] = Query([], description="Restrict to tags in these categories. Repeatable."),
+    q: Optional[str] = Query(None, description="Full-text search over achievements"),
+    match: str = Query("any", pattern="^(any|all)$"),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    if current_user.role != models.UserRole.employer:
+        raise HTTPException(status_code=403, detail="Only employers can search candidates")
+
+    total, results = candidate_index.search(db, tag, category, q, match == "all", page, page_size)
+    return {"total": total, "page": page, "page_size": page_size, "results": results}
+
 @app.post("/match-jobs")
 def match_jobs(resume_data: dict, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
     # ... (Existing matching logic)
@@ -83,6 +123,14 @@ def match_jobs(resume_data: dict, db: Session = Depends(get_db), current_user: m
 
 @app.websocket("/ws/match")
 async def websocket_match_jobs(websocket: WebSocket):
+    """
+    Starts a match session ({token, resume_text}) or resumes one
+    ({token, session_id, last_offset}) and streams its events. The session
+    itself runs on a background worker, so a dropped socket loses nothing.
+    With "follow": true the socket stays open after completion and receives
+    new_match events for jobs posted later. "protocol": 2 selects the compact
+    wire format described in ws_protocol.py.
+    """
     await websocket.accept()
     db = next(get_db())
     
@@ -106,78 +154,38 @@ async def websocket_match_jobs(websocket: WebSocket):
             await websocket.close()
             return
 
-        # 2. Thinking phase
-        await websocket.send_json({"status": "thinking", "message": "Analyzing resume with Gemini AI..."})
-        
-        # Generate Artifact (Achievements & Skills)
-        artifact_data = gemini_service.generate_student_artifact(resume_text)
-        await websocket.send_json({"status": "artifact", "data": artifact_data})
-        
-        await asyncio.sleep(1) # Visual pause
+        # 2. Start or resume the session
+        session_id = msg.get("session_id")
+        if session_id:
+            session = db.get(models.MatchSession, session_id)
+            if session is None or session.student_id != user.id:
+                await websocket.send_json({"error": "Unknown session"})
+                await websocket.close()
+                return
+        # Don't pin a pooled connection across the awaits below or for the lifetime of the socket.
+        db.close()
 
-        # 3. Ranking phase
-        jobs = db.query(models.Job).all()
-        jobs_list = [{"id": j.id, "title": j.title, "company": j.company, "description": j.description, "requirements": j.requirements} for j in jobs]
-        
-        ranked_results = gemini_service.rank_jobs(resume_text, jobs_list)
-        
-        # Merge with full job details
-        final_results = []
-        job_map = {j["id"]: j for j in jobs_list}
-        for match in ranked_results:
-            job_id = match.get("id")
-            if job_id in job_map:
-                final_results.append({
-                    **job_map[job_id],
-                    "match_score": match.get("match_score", 0),
-                    "reasoning": match.get("reasoning", "No reasoning provided."),
-                    "interview_questions": match.get("interview_questions", []),
-                    "missing_skills": match.get("missing_skills", [])
-                })
-        
-        await websocket.send_json({"status": "ranked", "jobs": final_results[:30]})
-        await asyncio.sleep(1)
-
-        # 4. Auto-Apply phase for top 10
-        top_10 = final_results[:10]
-        for i, job in enumerate(top_10):
-            # A. Phase: Tailoring (Simulated by Applicant Agent)
-            await websocket.send_json({"status": "tailoring", "job_id": job["id"], "job_title": job["title"]})
-            await asyncio.sleep(1)
-            
-            # Simple simulation: Tailored text is usually the original resume + some context.
-            # We'll intentionally inject a "Fabricated Skill" for the 3rd job to trigger the Auditor.
-            tailored_text = f"{resume_text}\n\n[Auto-Generated for {job['title']} at {job['company']}]"
-            if i == 2: # Trigger violation on the 3rd job
-                tailored_text += "\n\nExtra Experience: Expert in Quantum Blockchain AI and Neural Link Surgery."
-            
-            # B. Phase: Auditing (Simulated by The Auditor Agent)
-            await websocket.send_json({"status": "auditing", "job_id": job["id"]})
-            await asyncio.sleep(1.5)
-            
-            audit_result = gemini_service.audit_application(resume_text, tailored_text)
-            
-            if audit_result["safety_status"] == "FAIL":
-                # Create a log entry (In a real app, write to a DB table 'SafetyLogs')
-                log_entry = f"[SAFETY VIOLATION] Application to {job['title']} BLOCKED. Reason: {', '.join(audit_result['violations'])}. Explanation: {audit_result['explanation']}"
-                print(log_entry) # Terminal logging
-                
-                await websocket.send_json({
-                    "status": "violation", 
-                    "job_id": job["id"], 
-                    "reason": audit_result["explanation"],
-                    "details": audit_result["violations"]
-                })
-            else:
-                # C. Phase: Applying
-                await websocket.send_json({"status": "applying", "job_id": job["id"]})
-                await asyncio.sleep(1)
-                await websocket.send_json({"status": "applied", "job_id": job["id"]})
-
-        await websocket.send_json({"status": "complete", "message": "Applications processed. Check status for violations."})
+        if session_id:
+            last_offset = int(msg.get("last_offset", -1))
+            await database.run_in_thread(match_sessions.touch_session, session_id)
+        else:
+            # Turn new sessions away up front while the LLM queues are saturated
+            # or the student already has their share of sessions in progress.
+            try:
+                llm_scheduler.scheduler.check_admission(f"student:{user.id}", "interactive")
+                session_id = await database.run_in_thread(match_sessions.create_session, user, resume_text)
+            except (llm_scheduler.LLMQueueFull, match_sessions.TooManySessions) as e:
+                await websocket.send_json({"status": "error", "message": str(e), "retry_after": e.retry_after})
+                await websocket.close()
+                return
+            last_offset = -1
+
+        # 3. Replay + tail the session's event log
+        encoder = ws_protocol.EventEncoder(int(msg.get("protocol", 1)), msg.get("catalog_version"))
+        await match_sessions.stream_session(websocket, session_id, last_offset, follow=bool(msg.get("follow")), encoder=encoder)
         
     except WebSocketDisconnect:
-        print("WebSocket disconnected")
+        print("WebSocket disconnected (match session continues in the background)")
     except Exception as e:
         await websocket.send_json({"status": "error", "message": str(e)})
     finally:
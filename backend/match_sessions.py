@@ -0,0 +1,391 @@
+"""
+Durable match sessions.
+
+The match pipeline (Profile Agent -> Recruiter -> Tailor/Auditor -> Apply) runs
+as a background task on `task_queue`, not inside the WebSocket handler. Every
+progress event is appended to `match_events`, so a client that drops can
+reconnect with its session ID and last seen offset and get a replay from there
+without any LLM work being redone.
+"""
+import asyncio
+import json
+import os
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import candidate_index
+import catalog
+import gemini_service
+import llm_scheduler
+import models
+import task_queue
+import ws_protocol
+from database import run_in_thread
+
+TERMINAL_STATUSES = {"complete", "error"}
+POLL_INTERVAL = float(os.getenv("MATCH_EVENT_POLL_INTERVAL", 1.0))
+# How often a following socket marks its session as still active (see incremental_matcher).
+TOUCH_INTERVAL = float(os.getenv("MATCH_SESSION_TOUCH_INTERVAL", 60))
+# Protocol 2 waits this long after a wake-up so bursts of events share a frame.
+COALESCE_WINDOW = float(os.getenv("WS_COALESCE_MS", 20)) / 1000
+
+# Scales the cosmetic pauses between match phases; 0 disables them (benchmarks).
+UI_PAUSE_SCALE = float(os.getenv("UI_PAUSE_SCALE", "1"))
+# Queued or running sessions a student may have at once; /ws/match turns further ones away.
+MAX_OPEN_SESSIONS = int(os.getenv("MAX_OPEN_SESSIONS_PER_STUDENT", 3))
+# retry_after sent with that rejection.
+OPEN_SESSIONS_RETRY_AFTER = float(os.getenv("OPEN_SESSIONS_RETRY_AFTER", 30))
+# Times an Auditor call rejected by the LLM scheduler is re-queued before the application is held.
+AUDIT_RETRIES = int(os.getenv("AUDIT_RETRIES", 1))
+
+# session_id -> one Event per waiting tailer, set on the next append. Wakes
+# tailers in this process; tailers in other processes fall back to polling
+# every POLL_INTERVAL.
+_signals: Dict[str, Set[asyncio.Event]] = {}
+
+
+async def ui_pause(seconds: float):
+    if UI_PAUSE_SCALE > 0:
+        await asyncio.sleep(seconds * UI_PAUSE_SCALE)
+
+
+def _signal(session_id: str) -> asyncio.Event:
+    signal = asyncio.Event()
+    _signals.setdefault(session_id, set()).add(signal)
+    return signal
+
+
+def _unsubscribe(session_id: str, signal: asyncio.Event):
+    waiters = _signals.get(session_id)
+    if waiters is not None:
+        waiters.discard(signal)
+        if not waiters:
+            del _signals[session_id]
+
+
+def _notify(session_id: str):
+    for signal in _signals.pop(session_id, ()):
+        signal.set()
+
+
+def append_events(db: Session, session_id: str, events: List[Dict]) -> int:
+    """Appends `events` in one transaction and returns the last offset; see `publish` to wake tailers."""
+    payloads = [json.dumps(event) for event in events]
+    for attempt in range(3):
+        last = db.query(func.max(models.MatchEvent.seq)).filter(models.MatchEvent.session_id == session_id).scalar()
+        seq = -1 if last is None else last
+        for payload in payloads:
+            seq += 1
+            db.add(models.MatchEvent(session_id=session_id, seq=seq, payload=payload))
+        try:
+            db.commit()
+            break
+        except IntegrityError:
+            # Another writer (e.g. a new_match push) took this offset first.
+            db.rollback()
+            if attempt == 2:
+                raise
+    return seq
+
+
+async def publish(session_id: str, events: List[Dict]) -> int:
+    """Appends events from a worker thread, then wakes this process's tailers."""
+    seq = await run_in_thread(append_events, session_id, events)
+    _notify(session_id)
+    return seq
+
+
+class EventWriter:
+    """
+    Publishes one session's events, in order, from a background task so that
+    emitting never blocks the pipeline on the database. Events emitted
+    back-to-back are stored in one transaction.
+    """
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    def write(self, event: Dict):
+        self._queue.put_nowait(event)
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            events = [e for e in batch if e is not None]
+            if events:
+                await publish(self.session_id, events)
+            if batch[-1] is None:
+                return
+
+    async def close(self):
+        """Waits until every event written so far is stored."""
+        self._queue.put_nowait(None)
+        await self._task
+
+
+def touch_session(db: Session, session_id: str):
+    db.query(models.MatchSession).filter(models.MatchSession.id == session_id).update(
+        {models.MatchSession.updated_at: datetime.utcnow()}, synchronize_session=False)
+    db.commit()
+
+
+def read_events(db: Session, session_id: str, after: int = -1) -> List[Dict]:
+    rows = (
+        db.query(models.MatchEvent)
+        .filter(models.MatchEvent.session_id == session_id, models.MatchEvent.seq > after)
+        .order_by(models.MatchEvent.seq)
+        .all()
+    )
+    return [{**json.loads(r.payload), "session_id": session_id, "offset": r.seq} for r in rows]
+
+
+class TooManySessions(Exception):
+    """The student already has MAX_OPEN_SESSIONS queued or running; retry after `retry_after` seconds."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def create_session(db: Session, user: models.User, resume_text: str) -> str:
+    session_id = uuid.uuid4().hex
+    db.add(models.MatchSession(id=session_id, student_id=user.id, resume_text=resume_text))
+    # Count after the insert: the flush takes SQLite's write lock, so two
+    # sessions created at once can't both see room for one more.
+    db.flush()
+    open_sessions = db.query(func.count(models.MatchSession.id)).filter(
+        models.MatchSession.student_id == user.id,
+        models.MatchSession.status.in_([models.MatchSessionStatus.queued, models.MatchSessionStatus.running]),
+    ).scalar()
+    if open_sessions > MAX_OPEN_SESSIONS:
+        db.rollback()
+        raise TooManySessions(
+            f"You already have {MAX_OPEN_SESSIONS} match sessions in progress; wait for one to finish.",
+            OPEN_SESSIONS_RETRY_AFTER)
+    db.commit()
+    append_events(db, session_id, [{"status": "queued"}])
+    task_queue.enqueue(db, "match_session", {"session_id": session_id}, owner=f"student:{user.id}")
+    return session_id
+
+
+def _read_tail(db: Session, session_id: str, after: int, touch: bool) -> List[Dict]:
+    events = read_events(db, session_id, after)
+    if touch:
+        touch_session(db, session_id)
+    return events
+
+
+async def stream_session(websocket, session_id: str, after: int = -1, follow: bool = False,
+                         encoder: Optional[ws_protocol.EventEncoder] = None):
+    """
+    Replays events after `after`, then tails the log until the session ends.
+    With `follow`, keeps tailing past the end for new_match pushes. Stops as
+    soon as the client disconnects, so a closed tab neither keeps polling nor
+    keeps its session marked active.
+    """
+    tail = asyncio.create_task(_tail(websocket, session_id, after, follow, encoder or ws_protocol.EventEncoder()))
+    closed = asyncio.create_task(_wait_disconnect(websocket))
+    try:
+        await asyncio.wait({tail, closed}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        tail.cancel()
+        closed.cancel()
+        await asyncio.gather(tail, closed, return_exceptions=True)
+    if not tail.cancelled() and tail.exception() is not None:
+        raise tail.exception()
+
+
+async def _wait_disconnect(websocket):
+    # Clients don't send anything after the first message; drain until they go away.
+    while (await websocket.receive())["type"] != "websocket.disconnect":
+        pass
+
+
+async def _tail(websocket, session_id: str, after: int, follow: bool, encoder: ws_protocol.EventEncoder):
+    last_touch = time.monotonic()
+    while True:
+        # Subscribe before reading so an append in between isn't missed.
+        signal = _signal(session_id)
+        try:
+            touch = follow and time.monotonic() - last_touch > TOUCH_INTERVAL
+            events = await run_in_thread(_read_tail, session_id, after, touch)
+            if touch:
+                last_touch = time.monotonic()
+            done = False
+            for i, event in enumerate(events):
+                if event["status"] in TERMINAL_STATUSES and not follow:
+                    events, done = events[:i + 1], True
+                    break
+            snapshot = await catalog.get_snapshot_async() if events and encoder.protocol > 1 else None
+            for frame in encoder.encode(events, snapshot):
+                await websocket.send_text(frame)
+            if events:
+                after = events[-1]["offset"]
+            if done:
+                return
+            try:
+                await asyncio.wait_for(signal.wait(), POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                continue
+        finally:
+            # A finished or disconnected stream must not leave its Event behind.
+            _unsubscribe(session_id, signal)
+        if encoder.protocol > 1 and COALESCE_WINDOW > 0:
+            # Let events emitted back-to-back land in the same frame.
+            await asyncio.sleep(COALESCE_WINDOW)
+
+
+def _start_session(db: Session, session_id: str) -> Optional[Tuple[int, str, Dict]]:
+    """Marks the session running; returns (student_id, resume_text, logged events) or None if there's nothing to do."""
+    session = db.get(models.MatchSession, session_id)
+    if session is None or session.status in (models.MatchSessionStatus.complete, models.MatchSessionStatus.failed):
+        return None
+    session.status = models.MatchSessionStatus.running
+    db.commit()
+    # A re-run after a crash picks up from the log instead of redoing LLM calls.
+    logged = {(e["status"], e.get("job_id")): e for e in read_events(db, session_id)}
+    return session.student_id, session.resume_text, logged
+
+
+def _set_status(db: Session, session_id: str, status: models.MatchSessionStatus):
+    session = db.get(models.MatchSession, session_id)
+    session.status = status
+    db.commit()
+
+
+@task_queue.register("match_session")
+async def run_session(payload: Dict):
+    session_id = payload["session_id"]
+    started = await run_in_thread(_start_session, session_id)
+    if started is None:
+        return
+    student_id, resume_text, logged = started
+    writer = EventWriter(session_id)
+
+    def emit(event: Dict):
+        key = (event["status"], event.get("job_id"))
+        if key not in logged:
+            logged[key] = event
+            writer.write(event)
+
+    status = models.MatchSessionStatus.complete
+    try:
+        with llm_scheduler.caller(f"student:{student_id}", "interactive"):
+            await _pipeline(student_id, resume_text, logged, emit)
+    except Exception as e:
+        print(f"Match session {session_id} failed: {e}")
+        emit({"status": "error", "message": str(e)})
+        status = models.MatchSessionStatus.failed
+    finally:
+        await writer.close()
+    await run_in_thread(_set_status, session_id, status)
+
+
+async def _audit(resume_text: str, tailored_text: str) -> Optional[Dict]:
+    """Auditor verdict, re-queued once after a quota rejection; None if there's still none."""
+    for attempt in range(1 + AUDIT_RETRIES):
+        try:
+            return await gemini_service.audit_application(resume_text, tailored_text)
+        except llm_scheduler.LLMQueueFull as e:
+            if attempt == AUDIT_RETRIES:
+                return None
+            await asyncio.sleep(e.retry_after)
+
+
+async def _pipeline(student_id: int, resume_text: str, logged: Dict, emit):
+    # 1. Thinking phase
+    emit({"status": "thinking", "message": "Analyzing resume with Gemini AI..."})
+
+    # Generate Artifact (Achievements & Skills)
+    if ("artifact", None) not in logged:
+        artifact_data = await gemini_service.generate_student_artifact(resume_text)
+        # Persist + index it so employers can find this candidate.
+        await run_in_thread(candidate_index.save_artifact, student_id, artifact_data)
+        emit({"status": "artifact", "data": artifact_data})
+        await ui_pause(1) # Visual pause
+
+    # 2. Ranking phase
+    if ("ranked", None) in logged:
+        final_results = logged[("ranked", None)]["jobs"]
+    else:
+        snapshot = await catalog.get_snapshot_async()
+
+        ranked_results = await gemini_service.rank_jobs(resume_text, snapshot.jobs, snapshot.jobs_json)
+
+        # Merge with full job details
+        final_results = []
+        job_map = snapshot.by_id
+        for match in ranked_results:
+            job_id = match.get("id")
+            if job_id in job_map:
+                final_results.append({
+                    **job_map[job_id],
+                    "match_score": match.get("match_score", 0),
+                    "reasoning": match.get("reasoning", "No reasoning provided."),
+                    "interview_questions": match.get("interview_questions", []),
+                    "missing_skills": match.get("missing_skills", [])
+                })
+        final_results = final_results[:30]
+        emit({"status": "ranked", "jobs": final_results})
+        await ui_pause(1)
+
+    # 3. Auto-Apply phase for top 10
+    top_10 = final_results[:10]
+    for i, job in enumerate(top_10):
+        # A held application is audited again when the session is re-run.
+        if ("applied", job["id"]) in logged or ("violation", job["id"]) in logged:
+            continue
+
+        # A. Phase: Tailoring (Simulated by Applicant Agent)
+        emit({"status": "tailoring", "job_id": job["id"], "job_title": job["title"]})
+        await ui_pause(1)
+
+        # Simple simulation: Tailored text is usually the original resume + some context.
+        # We'll intentionally inject a "Fabricated Skill" for the 3rd job to trigger the Auditor.
+        tailored_text = f"{resume_text}\n\n[Auto-Generated for {job['title']} at {job['company']}]"
+        if i == 2: # Trigger violation on the 3rd job
+            tailored_text += "\n\nExtra Experience: Expert in Quantum Blockchain AI and Neural Link Surgery."
+
+        # B. Phase: Auditing (Simulated by The Auditor Agent)
+        emit({"status": "auditing", "job_id": job["id"]})
+        await ui_pause(1.5)
+
+        audit_result = await _audit(resume_text, tailored_text)
+        if audit_result is None:
+            # No verdict (AI service failing or at capacity): hold the application rather than send it unaudited.
+            print(f"[AUDIT HELD] Application to {job['title']} not sent: the Auditor gave no verdict.")
+            emit({
+                "status": "held",
+                "job_id": job["id"],
+                "reason": "The Auditor could not check this application because the AI service is unavailable. It was not sent."
+            })
+            continue
+
+        if audit_result["safety_status"] == "FAIL":
+            # Create a log entry (In a real app, write to a DB table 'SafetyLogs')
+            log_entry = f"[SAFETY VIOLATION] Application to {job['title']} BLOCKED. Reason: {', '.join(audit_result['violations'])}. Explanation: {audit_result['explanation']}"
+            print(log_entry) # Terminal logging
+
+            emit({
+                "status": "violation",
+                "job_id": job["id"],
+                "reason": audit_result["explanation"],
+                "details": audit_result["violations"]
+            })
+        else:
+            # C. Phase: Applying
+            emit({"status": "applying", "job_id": job["id"]})
+            await ui_pause(1)
+            emit({"status": "applied", "job_id": job["id"]})
+
+    emit({"status": "complete", "message": "Applications processed. Check status for violations."})
@@ -0,0 +1,39 @@
+"""
+Creates the database schema.
+
+Run once per deploy (`python migrate.py`) before starting the API. `main.py`
+also runs it on startup unless AUTO_MIGRATE=0, so a single dev server still
+works out of the box; importing the app no longer touches the database.
+"""
+from sqlalchemy import inspect, text
+
+import models
+from database import engine
+
+
+def _add_missing_columns():
+    """create_all skips existing tables; add nullable columns introduced since."""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in models.Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    ddl = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {ddl}'))
+
+
+def migrate():
+    _add_missing_columns()
+    models.Base.metadata.create_all(bind=engine)
+    # create_all skips existing tables, so add indexes introduced since they were created.
+    for table in models.Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+if __name__ == "__main__":
+    migrate()
+    print("Schema is up to date.")
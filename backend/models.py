@@ -1,6 +1,7 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Enum as SqlEnum
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, UniqueConstraint, Index, DDL, event, Enum as SqlEnum
 from sqlalchemy.orm import relationship
 import enum
+from datetime import datetime
 from database import Base
 from pydantic import BaseModel, EmailStr
 from typing import Optional, List
@@ -45,6 +46,23 @@ class JobOut(JobBase):
     class Config:
         from_attributes = True
 
+class ArtifactTagOut(BaseModel):
+    name: str
+    category: str
+
+class CandidateOut(BaseModel):
+    student_id: int
+    username: str
+    tags: List[ArtifactTagOut]
+    achievements: List[str]
+    score: int
+
+class CandidatePage(BaseModel):
+    total: int
+    page: int
+    page_size: int
+    results: List[CandidateOut]
+
 class User(Base):
     __tablename__ = "users"
 
@@ -78,3 +96,91 @@ class Application(Base):
 
     student = relationship("User")
     job = relationship("Job")
+
+class MatchSessionStatus(str, enum.Enum):
+    queued = "queued"
+    running = "running"
+    complete = "complete"
+    failed = "failed"
+
+class MatchSession(Base):
+    __tablename__ = "match_sessions"
+
+    id = Column(String, primary_key=True)
+    student_id = Column(Integer, ForeignKey("users.id"), index=True)
+    resume_text = Column(Text)
+    status = Column(SqlEnum(MatchSessionStatus), default=MatchSessionStatus.queued)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    student = relationship("User")
+
+    # incremental_matcher.active_sessions: range on updated_at, then latest created_at per student.
+    __table_args__ = (Index("ix_match_sessions_active", "updated_at", "student_id", "created_at", "id"),)
+
+class MatchEvent(Base):
+    """Append-only progress log of a match session, replayed on reconnect."""
+    __tablename__ = "match_events"
+    __table_args__ = (UniqueConstraint("session_id", "seq"),)
+
+    id = Column(Integer, primary_key=True)
+    session_id = Column(String, ForeignKey("match_sessions.id"), index=True)
+    seq = Column(Integer)
+    payload = Column(Text)
+
+class TaskStatus(str, enum.Enum):
+    queued = "queued"
+    claimed = "claimed"
+    done = "done"
+    failed = "failed"
+
+class QueuedTask(Base):
+    """Row in the SQLite stand-in for a task broker (see task_queue.py)."""
+    __tablename__ = "task_queue"
+
+    # task_queue.claim: how many tasks each owner already has claimed.
+    __table_args__ = (Index("ix_task_queue_owner", "owner", "status"),)
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, index=True)
+    payload = Column(Text)
+    # Scheduler user key ("student:<id>") the task runs for; claims are shared out per owner.
+    owner = Column(String, nullable=True)
+    status = Column(SqlEnum(TaskStatus), default=TaskStatus.queued, index=True)
+    attempts = Column(Integer, default=0)
+    lease_expires_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class StudentArtifact(Base):
+    """Latest Profile Agent output per student, as shown on the Artifact Card."""
+    __tablename__ = "student_artifacts"
+    # Unfiltered candidate search lists the most recently updated artifacts first.
+    __table_args__ = (Index("ix_student_artifacts_updated", "updated_at", "student_id"),)
+
+    student_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    tags = Column(Text)
+    achievements = Column(Text)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    student = relationship("User")
+
+class ArtifactTag(Base):
+    """Inverted index over artifact tags: (name, category) -> students."""
+    __tablename__ = "artifact_tags"
+    __table_args__ = (
+        Index("ix_artifact_tags_name_category_student", "name", "category", "student_id"),
+        Index("ix_artifact_tags_category_student", "category", "student_id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    student_id = Column(Integer, ForeignKey("users.id"), index=True)
+    name = Column(String)
+    category = Column(String)
+
+# Full-text index over achievements; rowid is the student id.
+event.listen(
+    StudentArtifact.__table__,
+    "after_create",
+    DDL("CREATE VIRTUAL TABLE IF NOT EXISTS artifact_fts USING fts5(achievements)").execute_if(dialect="sqlite"),
+)
@@ -1,11 +1,9 @@
 import random
 from sqlalchemy.orm import Session
-from database import SessionLocal, engine
+from database import SessionLocal
+import migrate
 import models
 
-# Ensure tables are created
-models.Base.metadata.create_all(bind=engine)
-
 COMPANIES = [
     "TechGiant", "DataFlow", "CloudNine", "InnovateSoft", "ByteMe", 
     "CyberPulse", "LogicGate", "NebulaSystems", "PixelPerfect", "QuantEdge",
@@ -46,7 +44,25 @@ REQUIREMENTS = [
     "Experience with SQL and NoSQL databases. Familiarity with Agile methodologies."
 ]
 
-def seed_database():
+def generate_jobs(count: int = 100, rng: random.Random = random):
+    """Yields `count` unsaved Job rows drawn from the seed vocab."""
+    for _ in range(count):
+        dept = rng.choice(list(ROLES.keys()))
+        title = rng.choice(ROLES[dept])
+        company = rng.choice(COMPANIES)
+        location = rng.choice(LOCATIONS)
+        full_title = f"{title} - {dept} ({location})"
+
+        yield models.Job(
+            title=full_title,
+            company=company,
+            description=rng.choice(DESCRIPTIONS),
+            requirements=rng.choice(REQUIREMENTS)
+        )
+
+def seed_database(count: int = 100):
+    # Ensure tables are created
+    migrate.migrate()
     db = SessionLocal()
     try:
         # Check if jobs already exist
@@ -54,22 +70,7 @@ def seed_database():
             print("Database already seeded.")
             return
 
-        jobs = []
-        for i in range(100):
-            dept = random.choice(list(ROLES.keys()))
-            title = random.choice(ROLES[dept])
-            company = random.choice(COMPANIES)
-            location = random.choice(LOCATIONS)
-            full_title = f"{title} - {dept} ({location})"
-            
-            job = models.Job(
-                title=full_title,
-                company=company,
-                description=random.choice(DESCRIPTIONS),
-                requirements=random.choice(REQUIREMENTS)
-            )
-            jobs.append(job)
-        
+        jobs = list(generate_jobs(count))
         db.add_all(jobs)
         db.commit()
         print(f"Successfully seeded {len(jobs)} jobs.")
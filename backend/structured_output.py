@@ -0,0 +1,172 @@
+"""
+Parsing, validation and bookkeeping for the agents' JSON responses.
+
+The agents ask Gemini for schema-constrained JSON (`gemini_schema`), but a
+response can still be cut off or contain an item that doesn't validate.
+Instead of discarding the whole response, `loads` recovers the longest valid
+prefix of a truncated document (closing any open arrays/objects) and
+`validate_items` keeps the elements that pass the Pydantic model, so the caller
+only has to re-request what is missing.
+
+`stats` counts, per agent, how responses were handled so the benchmark can
+report fallback rates.
+"""
+import json
+import re
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple, Type
+
+from pydantic import BaseModel, TypeAdapter, ValidationError
+
+# Keys of the OpenAPI subset understood by Gemini's response_schema.
+_SCHEMA_KEYS = {"type", "properties", "items", "required", "enum", "description"}
+
+_decoder = json.JSONDecoder()
+
+
+def gemini_schema(tp: Any) -> Dict:
+    """response_schema for `tp` (a Pydantic model or e.g. List[Model])."""
+    schema = TypeAdapter(tp).json_schema()
+    defs = schema.pop("$defs", {})
+
+    def convert(node: Dict) -> Dict:
+        if "$ref" in node:
+            node = defs[node["$ref"].rsplit("/", 1)[-1]]
+        out = {k: v for k, v in node.items() if k in _SCHEMA_KEYS}
+        if "properties" in out:
+            out["properties"] = {k: convert(v) for k, v in out["properties"].items()}
+        if "items" in out:
+            out["items"] = convert(out["items"])
+        return out
+
+    return convert(schema)
+
+
+def strip_fences(text: str) -> str:
+    return re.sub(r'```json\s*|\s*```', '', text).strip()
+
+
+def _close_truncated(text: str) -> Optional[str]:
+    """
+    Cuts a truncated JSON document back to the last complete array element or
+    object member and closes whatever is still open.
+    """
+    stack: List[str] = []
+    in_string = escape = False
+    cut, cut_stack = None, None
+    for i, ch in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in "[{":
+            stack.append(ch)
+        elif ch in "]}":
+            if not stack:
+                break
+            stack.pop()
+            if not stack:
+                return text[:i + 1]
+            cut, cut_stack = i + 1, list(stack)
+        elif ch == "," and stack:
+            cut, cut_stack = i, list(stack)
+    if cut is None:
+        return None
+    return text[:cut] + "".join("]" if c == "[" else "}" for c in reversed(cut_stack))
+
+
+def loads(text: str) -> Tuple[Any, bool]:
+    """
+    Parses an agent response: (data, complete). `complete` is False when only a
+    prefix could be recovered; data is None when nothing could.
+    """
+    text = strip_fences(text)
+    try:
+        return json.loads(text), True
+    except ValueError:
+        pass
+    starts = [i for i in (text.find("["), text.find("{")) if i >= 0]
+    if not starts:
+        return None, False
+    start = min(starts)
+    try:
+        # Complete document followed by chatter.
+        return _decoder.raw_decode(text, start)[0], True
+    except ValueError:
+        pass
+    closed = _close_truncated(text[start:])
+    if closed is None:
+        return None, False
+    try:
+        return json.loads(closed), False
+    except ValueError:
+        return None, False
+
+
+def is_strict_json(text: str) -> bool:
+    """Whether the response parses as-is (the only case the old parser accepted)."""
+    try:
+        json.loads(strip_fences(text))
+        return True
+    except ValueError:
+        return False
+
+
+def validate_items(model: Type[BaseModel], items: Any) -> Tuple[List[BaseModel], int]:
+    """(valid items, number of invalid items) of a parsed JSON array."""
+    if not isinstance(items, list):
+        return [], 0
+    valid, invalid = [], 0
+    for item in items:
+        try:
+            valid.append(model.model_validate(item))
+        except ValidationError:
+            invalid += 1
+    return valid, invalid
+
+
+class AgentStats:
+    """
+    Per-agent counters. Every agent call ends up as exactly one of:
+    - ok:       the first response was complete and valid;
+    - repaired: the result was salvaged from a partial response and/or re-requests;
+    - fallback: no usable LLM output, the agent's canned fallback was returned
+                (for the Auditor: no verdict, the application is held).
+    `strict_failures` counts first responses the old json.loads parser would
+    have rejected (or that raised), i.e. the old fallback rate.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    def incr(self, agent: str, key: str, n: int = 1):
+        with self._lock:
+            self._counts[agent][key] += n
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            out = {}
+            for agent, c in self._counts.items():
+                calls = c["ok"] + c["repaired"] + c["fallback"]
+                out[agent] = {
+                    **c,
+                    "calls": calls,
+                    "fallback_rate": round(c["fallback"] / calls, 4) if calls else 0.0,
+                    "strict_failure_rate": round(c["strict_failures"] / calls, 4) if calls else 0.0,
+                }
+            return out
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+stats = AgentStats()
@@ -0,0 +1,149 @@
+"""
+Deterministic offline stand-in for the Gemini models used by the agents.
+
+`install()` swaps the stub into `gemini_service` (Profile / Recruiter / Auditor
+agents) and `index` (Resume Parser) so the whole backend can run without
+network access or an API key. Latency and failures are injected from a seeded
+RNG so runs are reproducible.
+"""
+import json
+import random
+import threading
+import time
+from typing import Dict, List, Optional
+
+STACK = [
+    ("Python", "languages"), ("JavaScript", "languages"), ("Go", "languages"),
+    ("Java", "languages"), ("C++", "languages"),
+    ("PyTorch", "ml_ai"), ("TensorFlow", "ml_ai"), ("Scikit-learn", "ml_ai"),
+    ("React", "frameworks"), ("FastAPI", "frameworks"), ("Django", "frameworks"),
+    ("SQL", "others"), ("AWS", "others"), ("Docker", "others"),
+]
+
+
+class StubLLMError(RuntimeError):
+    """Raised for injected failures, mimicking a provider error."""
+
+
+class StubResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class StubLLM:
+    """
+    Answers the three agent prompts and the resume-parser prompt with
+    well-formed JSON derived from the prompt itself.
+
+    latency_ms:   base latency of every call.
+    jitter_ms:    uniform jitter added on top of the base latency.
+    per_kchar_ms: extra latency per 1000 prompt characters (long job lists cost more).
+    failure_rate: probability in [0, 1] that a call raises StubLLMError.
+    truncate_rate: probability that the response is cut off part-way, like a
+                   reply that hit the output token limit.
+    """
+
+    def __init__(self, latency_ms: float = 0, jitter_ms: float = 0, per_kchar_ms: float = 0,
+                 failure_rate: float = 0.0, seed: int = 0, truncate_rate: float = 0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.per_kchar_ms = per_kchar_ms
+        self.failure_rate = failure_rate
+        self.truncate_rate = truncate_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+        self.truncations = 0
+
+    # --- google.generativeai.GenerativeModel surface ---
+    def generate_content(self, prompt: str, **kwargs) -> StubResponse:
+        return StubResponse(self._complete(prompt))
+
+    # --- langchain chat model surface ---
+    def invoke(self, prompt: str, **kwargs) -> str:
+        return self._complete(prompt)
+
+    def _complete(self, prompt: str) -> str:
+        with self._lock:
+            self.calls += 1
+            fail = self._rng.random() < self.failure_rate
+            jitter = self._rng.uniform(0, self.jitter_ms) if self.jitter_ms else 0
+            cut = self._rng.uniform(0.2, 0.95) if self._rng.random() < self.truncate_rate else None
+            if fail:
+                self.failures += 1
+            elif cut is not None:
+                self.truncations += 1
+        delay = self.latency_ms + jitter + self.per_kchar_ms * len(prompt) / 1000
+        if delay > 0:
+            # Blocking on purpose: the real SDK call is synchronous too.
+            time.sleep(delay / 1000)
+        if fail:
+            raise StubLLMError("Injected stub failure")
+
+        if "'The Profile Agent'" in prompt:
+            text = json.dumps(self._artifact(prompt))
+        elif "'Recruiter' AI" in prompt:
+            text = json.dumps(self._ranking(prompt))
+        elif "'The Auditor' AI" in prompt:
+            text = json.dumps(self._audit(prompt))
+        else:
+            text = json.dumps(self._parsed_resume(prompt))
+        return text[:int(len(text) * cut)] if cut is not None else text
+
+    def _artifact(self, prompt: str) -> Dict:
+        lower = prompt.split("RESUME TEXT:", 1)[-1].lower()
+        tags = [{"name": n, "category": c} for n, c in STACK if n.lower() in lower]
+        return {
+            "tags": tags or [{"name": "Python", "category": "languages"}],
+            "achievements": [f"Delivered project #{i + 1} with measurable impact." for i in range(5)],
+        }
+
+    def _ranking(self, prompt: str) -> List[Dict]:
+        head, _, jobs_json = prompt.partition("\n\nJOBS:\n")
+        resume = head.split("RESUME:", 1)[-1].lower()
+        words = set(resume.split())
+        results = []
+        for job in json.loads(jobs_json):
+            reqs = f"{job['title']} {job['requirements']}".lower().split()
+            overlap = sum(1 for w in reqs if w in words)
+            score = min(40 + overlap * 7 + job["id"] % 11, 99)
+            results.append({
+                "id": job["id"],
+                "match_score": score,
+                "reasoning": f"Shares {overlap} requirement terms with the resume.",
+                "interview_questions": [f"Question {i + 1} about {job['title']}?" for i in range(3)],
+                "missing_skills": [] if score > 80 else ["System Design"],
+            })
+        results.sort(key=lambda r: r["match_score"], reverse=True)
+        return results[:30]
+
+    def _audit(self, prompt: str) -> Dict:
+        tailored = prompt.split("TAILORED APPLICATION:", 1)[-1]
+        if "Quantum Blockchain" in tailored:
+            return {
+                "safety_status": "FAIL",
+                "violations": ["Quantum Blockchain AI", "Neural Link Surgery"],
+                "explanation": "Tailored application claims skills absent from the resume.",
+            }
+        return {"safety_status": "PASS", "violations": [], "explanation": "No fabricated claims found."}
+
+    def _parsed_resume(self, prompt: str) -> Dict:
+        return {
+            "structured_profile": ["Education: B.Sc. Computer Science"],
+            "bullet_bank": ["Built a job-matching service in FastAPI."],
+            "answer_library": ["Authorized to work; available immediately."],
+            "proof_pack": ["https://github.com/example/project"],
+            "rules": ["Do not invent experience, numbers, titles, or achievements."],
+        }
+
+
+def install(stub: Optional[StubLLM] = None) -> StubLLM:
+    """Routes every agent and the resume parser through `stub`."""
+    import gemini_service
+    import index
+
+    stub = stub or StubLLM()
+    gemini_service.set_model(stub)
+    index.initialize_llm = lambda: stub
+    return stub
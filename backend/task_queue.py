@@ -0,0 +1,183 @@
+"""
+Minimal durable task queue backed by the app database.
+
+A local stand-in for a real broker (Redis / Celery / Cloud Tasks): tasks are
+rows in `task_queue`, workers claim them with a lease, and a task whose lease
+runs out (worker crashed, process restarted) is picked up again. Handlers are
+async functions registered per task kind and must be safe to re-run.
+
+Tasks can name an `owner` (the scheduler user key, e.g. "student:42"). Free
+workers claim for the owner with the fewest tasks already claimed, oldest task
+first, so one user's backlog doesn't hold every worker while others wait.
+
+All queue queries run in worker threads. Idle workers sleep until `enqueue()`
+in this process hands one of them a wake-up; they only poll (every
+TASK_POLL_INTERVAL) to notice expired leases and tasks enqueued elsewhere.
+"""
+import asyncio
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, or_, select
+from sqlalchemy.orm import Session, aliased
+
+import models
+from database import run_in_thread
+
+LEASE_SECONDS = int(os.getenv("TASK_LEASE_SECONDS", 60))
+MAX_ATTEMPTS = int(os.getenv("TASK_MAX_ATTEMPTS", 3))
+POLL_INTERVAL = float(os.getenv("TASK_POLL_INTERVAL", 5))
+
+Handler = Callable[[Dict], Awaitable[None]]
+HANDLERS: Dict[str, Handler] = {}
+
+# One permit per task enqueued by this process; each wakes a single idle worker.
+_ready: Optional[asyncio.Semaphore] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_workers: List[asyncio.Task] = []
+
+
+def register(kind: str):
+    def decorator(fn: Handler) -> Handler:
+        HANDLERS[kind] = fn
+        return fn
+    return decorator
+
+
+def enqueue(db: Session, kind: str, payload: Dict, owner: Optional[str] = None) -> models.QueuedTask:
+    task = models.QueuedTask(kind=kind, payload=json.dumps(payload), owner=owner)
+    db.add(task)
+    db.commit()
+    _wake()
+    return task
+
+
+def _wake():
+    # enqueue() is also called from threadpool endpoints and worker threads.
+    if _loop is not None and not _loop.is_closed():
+        _loop.call_soon_threadsafe(_ready.release)
+
+
+def claim(db: Session) -> Optional[models.QueuedTask]:
+    """
+    Claims a runnable task (queued, or claimed with an expired lease): the
+    oldest one of the owner with the fewest live claims.
+    """
+    now = datetime.utcnow()
+    runnable = or_(
+        models.QueuedTask.status == models.TaskStatus.queued,
+        (models.QueuedTask.status == models.TaskStatus.claimed) & (models.QueuedTask.lease_expires_at < now),
+    )
+    held = aliased(models.QueuedTask)
+    owner_load = (
+        select(func.count())
+        .where(held.owner.is_not_distinct_from(models.QueuedTask.owner),
+               held.status == models.TaskStatus.claimed, held.lease_expires_at >= now)
+        .correlate(models.QueuedTask)
+        .scalar_subquery()
+    )
+    for _ in range(3):
+        task = db.query(models.QueuedTask).filter(runnable).order_by(owner_load, models.QueuedTask.id).first()
+        if task is None:
+            return None
+        # Conditional update so two workers racing for the same row can't both win.
+        won = db.query(models.QueuedTask).filter(models.QueuedTask.id == task.id, runnable).update({
+            models.QueuedTask.status: models.TaskStatus.claimed,
+            models.QueuedTask.lease_expires_at: now + timedelta(seconds=LEASE_SECONDS),
+            models.QueuedTask.attempts: models.QueuedTask.attempts + 1,
+        }, synchronize_session=False)
+        db.commit()
+        if won:
+            db.refresh(task)
+            return task
+    return None
+
+
+def renew(db: Session, task_id: int):
+    db.query(models.QueuedTask).filter(models.QueuedTask.id == task_id).update({
+        models.QueuedTask.lease_expires_at: datetime.utcnow() + timedelta(seconds=LEASE_SECONDS),
+    }, synchronize_session=False)
+    db.commit()
+
+
+def complete(db: Session, task_id: int):
+    db.query(models.QueuedTask).filter(models.QueuedTask.id == task_id).update({
+        models.QueuedTask.status: models.TaskStatus.done,
+        models.QueuedTask.lease_expires_at: None,
+    }, synchronize_session=False)
+    db.commit()
+
+
+def fail(db: Session, task_id: int, attempts: int, error: str):
+    retry = attempts < MAX_ATTEMPTS
+    db.query(models.QueuedTask).filter(models.QueuedTask.id == task_id).update({
+        models.QueuedTask.status: models.TaskStatus.queued if retry else models.TaskStatus.failed,
+        models.QueuedTask.lease_expires_at: None,
+        models.QueuedTask.last_error: error,
+    }, synchronize_session=False)
+    db.commit()
+
+
+async def _keep_lease(task_id: int):
+    while True:
+        await asyncio.sleep(LEASE_SECONDS / 3)
+        await run_in_thread(renew, task_id)
+
+
+def _finish(db: Session, task_id: int, attempts: int, error: Optional[str] = None):
+    if error is None:
+        complete(db, task_id)
+    else:
+        fail(db, task_id, attempts, error)
+
+
+def _claim_next(db: Session) -> Optional[Tuple[int, str, str, int]]:
+    task = claim(db)
+    return (task.id, task.kind, task.payload, task.attempts) if task is not None else None
+
+
+async def _run_one(task_id: int, kind: str, payload: str, attempts: int):
+    handler = HANDLERS.get(kind)
+    if handler is None:
+        await run_in_thread(_finish, task_id, attempts, f"No handler registered for {kind}")
+        return
+    heartbeat = asyncio.create_task(_keep_lease(task_id))
+    try:
+        await handler(json.loads(payload))
+        await run_in_thread(_finish, task_id, attempts)
+    except Exception as e:
+        print(f"Task {task_id} ({kind}) failed on attempt {attempts}: {e}")
+        await run_in_thread(_finish, task_id, attempts, str(e))
+    finally:
+        heartbeat.cancel()
+
+
+async def worker_loop():
+    while True:
+        # Claim with a short-lived session: handlers run for a long time and
+        # must not pin a pooled connection while they await.
+        claimed = await run_in_thread(_claim_next)
+        if claimed is not None:
+            await _run_one(*claimed)
+            continue
+        try:
+            await asyncio.wait_for(_ready.acquire(), POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+
+def start_workers(count: int):
+    global _ready, _loop
+    _ready = asyncio.Semaphore(0)
+    _loop = asyncio.get_running_loop()
+    for _ in range(count):
+        _workers.append(asyncio.create_task(worker_loop()))
+
+
+async def stop_workers():
+    for worker in _workers:
+        worker.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
@@ -0,0 +1,69 @@
+"""
+Wire encoding for /ws/match events.
+
+Protocol 1 (default) sends every event as its own JSON text frame, exactly as
+it is stored in the session log.
+
+Protocol 2 is opted into with {"protocol": 2, "catalog_version": N} in the
+hello message and:
+- coalesces every event available at once into a single frame:
+  {"v": 2, "catalog_version": <server version>, "events": [...]}
+- references jobs by ID in `ranked` / `new_match` events when the client's
+  catalog version (from GET /jobs' X-Catalog-Version header) is current, so
+  description/requirements text isn't re-sent;
+- is serialized with orjson when it's installed.
+
+Per-message deflate is negotiated by the server's WebSocket transport
+(uvicorn enables it by default) and applies to both protocols.
+"""
+import json
+from typing import Dict, List, Optional
+
+import catalog
+
+try:
+    import orjson
+
+    def dumps(obj) -> str:
+        return orjson.dumps(obj).decode()
+except ImportError:  # pragma: no cover - orjson is optional
+    def dumps(obj) -> str:
+        return json.dumps(obj, separators=(",", ":"))
+
+LATEST_PROTOCOL = 2
+
+# Job fields the client already has from GET /jobs.
+CATALOG_FIELDS = ("title", "company", "description", "requirements")
+
+
+def _slim_job(job: Dict, snapshot: catalog.CatalogSnapshot) -> Dict:
+    if job.get("id") not in snapshot.by_id:
+        return job
+    return {k: v for k, v in job.items() if k not in CATALOG_FIELDS}
+
+
+def slim_event(event: Dict, snapshot: catalog.CatalogSnapshot) -> Dict:
+    status = event.get("status")
+    if status == "ranked":
+        return {**event, "jobs": [_slim_job(j, snapshot) for j in event["jobs"]]}
+    if status == "new_match":
+        return {**event, "job": _slim_job(event["job"], snapshot)}
+    return event
+
+
+class EventEncoder:
+    """Turns batches of logged events into WebSocket text frames for one client."""
+
+    def __init__(self, protocol: int = 1, catalog_version: Optional[int] = None):
+        self.protocol = protocol if protocol in (1, LATEST_PROTOCOL) else 1
+        self.catalog_version = int(catalog_version) if catalog_version is not None else None
+
+    def encode(self, events: List[Dict], snapshot: Optional[catalog.CatalogSnapshot] = None) -> List[str]:
+        if not events:
+            return []
+        if self.protocol == 1:
+            return [dumps(e) for e in events]
+        snapshot = snapshot or catalog.get_snapshot()
+        if self.catalog_version == snapshot.version:
+            events = [slim_event(e, snapshot) for e in events]
+        return [dumps({"v": 2, "catalog_version": snapshot.version, "events": events})]
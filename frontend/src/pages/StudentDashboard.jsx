@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { useAuth } from '../context/AuthContext';
 import StudentArtifactCard from '../components/StudentArtifactCard';
 
@@ -14,14 +14,22 @@ const StudentDashboard = () => {
     const [auditingIds, setAuditingIds] = useState(new Set());
     const [tailoringIds, setTailoringIds] = useState(new Set());
     const [violations, setViolations] = useState({}); // job_id -> {reason, details}
+    const [heldApplications, setHeldApplications] = useState({}); // job_id -> reason (not audited, not sent)
     const [wsStatus, setWsStatus] = useState('');
     const [activeTabs, setActiveTabs] = useState({}); // job_id -> 'overview' | 'insights'
     const [artifactData, setArtifactData] = useState(null);
+    const socketRef = useRef(null);
+    // Jobs from GET /jobs; protocol 2 sends ranked jobs by ID when our catalog version is current.
+    const catalogRef = useRef({ version: null, byId: {} });
 
     useEffect(() => {
         fetch('http://localhost:8000/jobs')
-            .then(res => res.json())
+            .then(res => {
+                catalogRef.current.version = res.headers.get('X-Catalog-Version');
+                return res.json();
+            })
             .then(data => {
+                catalogRef.current.byId = Object.fromEntries(data.map(job => [job.id, job]));
                 setJobs(data);
                 setLoading(false);
             })
@@ -31,14 +39,31 @@ const StudentDashboard = () => {
             });
     }, []);
 
+    const closeSocket = () => {
+        if (socketRef.current) {
+            socketRef.current.onclose = null;
+            socketRef.current.close();
+            socketRef.current = null;
+        }
+    };
+
+    useEffect(() => closeSocket, []);
+
     const handleApply = () => {
         if (!resume.trim()) {
             setMessage('Please paste your resume text first.');
             return;
         }
 
+        closeSocket();
         const token = localStorage.getItem('token');
-        const ws = new WebSocket(`ws://localhost:8000/ws/match`);
+        // The match runs server-side; if the socket drops we resume from the last seen offset.
+        let sessionId = null;
+        let lastOffset = -1;
+        let finished = false;
+        let retries = 0;
+        const withCatalog = (job) => ({ ...catalogRef.current.byId[job.id], ...job });
+        const protocol = { protocol: 2, catalog_version: catalogRef.current.version };
 
         setLoading(true);
         setApplyingIds(new Set());
@@ -46,82 +71,130 @@ const StudentDashboard = () => {
         setAuditingIds(new Set());
         setTailoringIds(new Set());
         setViolations({});
+        setHeldApplications({});
         setJobs([]);
         setArtifactData(null);
 
-        ws.onopen = () => {
-            ws.send(JSON.stringify({ token, resume_text: resume }));
-        };
+        const connect = () => {
+            const ws = new WebSocket(`ws://localhost:8000/ws/match`);
+            socketRef.current = ws;
 
-        ws.onmessage = (event) => {
-            const data = JSON.parse(event.data);
-
-            if (data.status === 'thinking') {
-                setWsStatus('Thinking...');
-                setMessage(data.message);
-            } else if (data.status === 'artifact') {
-                setArtifactData(data.data);
-            } else if (data.status === 'ranked') {
-                setWsStatus('Ranked');
-                setJobs(data.jobs);
-                setMessage('AI has ranked the best matches!');
-            } else if (data.status === 'tailoring') {
-                setWsStatus('Tailoring...');
-                setTailoringIds(prev => new Set(prev).add(data.job_id));
-                setMessage(`Tailoring application for ${data.job_title}...`);
-            } else if (data.status === 'auditing') {
-                setWsStatus('Auditing...');
-                setTailoringIds(prev => {
-                    const next = new Set(prev);
-                    next.delete(data.job_id);
-                    return next;
-                });
-                setAuditingIds(prev => new Set(prev).add(data.job_id));
-                setMessage(`The Auditor is verifying application integrity...`);
-            } else if (data.status === 'applying') {
-                setWsStatus('Applying...');
-                setAuditingIds(prev => {
-                    const next = new Set(prev);
-                    next.delete(data.job_id);
-                    return next;
-                });
-                setApplyingIds(prev => new Set(prev).add(data.job_id));
-            } else if (data.status === 'applied') {
-                setApplyingIds(prev => {
-                    const next = new Set(prev);
-                    next.delete(data.job_id);
-                    return next;
-                });
-                setAppliedIds(prev => new Set(prev).add(data.job_id));
-            } else if (data.status === 'violation') {
-                setWsStatus('Safety Violation');
-                setAuditingIds(prev => {
-                    const next = new Set(prev);
-                    next.delete(data.job_id);
-                    return next;
-                });
-                setViolations(prev => ({
-                    ...prev,
-                    [data.job_id]: { reason: data.reason, details: data.details }
-                }));
-                setMessage(`Safety Violation detected! Check results.`);
-            } else if (data.status === 'complete') {
-                setWsStatus('Complete');
-                setLoading(false);
-                setMessage(data.message);
-                ws.close();
-            } else if (data.status === 'error') {
-                setMessage('Error: ' + data.message);
+            ws.onopen = () => {
+                retries = 0;
+                ws.send(JSON.stringify(sessionId
+                    ? { token, session_id: sessionId, last_offset: lastOffset, follow: true, ...protocol }
+                    : { token, resume_text: resume, follow: true, ...protocol }));
+            };
+
+            const handleEvent = (data) => {
+                if (data.session_id) sessionId = data.session_id;
+                if (data.offset !== undefined) lastOffset = data.offset;
+
+                if (data.status === 'thinking') {
+                    setWsStatus('Thinking...');
+                    setMessage(data.message);
+                } else if (data.status === 'artifact') {
+                    setArtifactData(data.data);
+                } else if (data.status === 'ranked') {
+                    setWsStatus('Ranked');
+                    setJobs(data.jobs.map(withCatalog));
+                    setMessage('AI has ranked the best matches!');
+                } else if (data.status === 'tailoring') {
+                    setWsStatus('Tailoring...');
+                    setTailoringIds(prev => new Set(prev).add(data.job_id));
+                    setMessage(`Tailoring application for ${data.job_title}...`);
+                } else if (data.status === 'auditing') {
+                    setWsStatus('Auditing...');
+                    setTailoringIds(prev => {
+                        const next = new Set(prev);
+                        next.delete(data.job_id);
+                        return next;
+                    });
+                    setAuditingIds(prev => new Set(prev).add(data.job_id));
+                    setMessage(`The Auditor is verifying application integrity...`);
+                } else if (data.status === 'applying') {
+                    setWsStatus('Applying...');
+                    setAuditingIds(prev => {
+                        const next = new Set(prev);
+                        next.delete(data.job_id);
+                        return next;
+                    });
+                    setApplyingIds(prev => new Set(prev).add(data.job_id));
+                } else if (data.status === 'applied') {
+                    setApplyingIds(prev => {
+                        const next = new Set(prev);
+                        next.delete(data.job_id);
+                        return next;
+                    });
+                    // A re-run session may audit and send an application it held earlier.
+                    setHeldApplications(prev => {
+                        const { [data.job_id]: _, ...rest } = prev;
+                        return rest;
+                    });
+                    setAppliedIds(prev => new Set(prev).add(data.job_id));
+                } else if (data.status === 'held') {
+                    setWsStatus('Application Held');
+                    setAuditingIds(prev => {
+                        const next = new Set(prev);
+                        next.delete(data.job_id);
+                        return next;
+                    });
+                    setHeldApplications(prev => ({ ...prev, [data.job_id]: data.reason }));
+                    setMessage(`An application was held: the Auditor is unavailable.`);
+                } else if (data.status === 'violation') {
+                    setWsStatus('Safety Violation');
+                    setAuditingIds(prev => {
+                        const next = new Set(prev);
+                        next.delete(data.job_id);
+                        return next;
+                    });
+                    setViolations(prev => ({
+                        ...prev,
+                        [data.job_id]: { reason: data.reason, details: data.details }
+                    }));
+                    setMessage(`Safety Violation detected! Check results.`);
+                } else if (data.status === 'complete') {
+                    // Keep the socket open: jobs posted later arrive as new_match events.
+                    finished = true;
+                    setWsStatus('Complete');
+                    setLoading(false);
+                    setMessage(data.message);
+                } else if (data.status === 'new_match') {
+                    const job = withCatalog(data.job);
+                    setJobs(prev => prev.some(j => j.id === job.id) ? prev : [job, ...prev]);
+                    setMessage(`New match: ${job.title} at ${job.company}`);
+                } else if (data.status === 'error' || data.error) {
+                    finished = true;
+                    setMessage('Error: ' + (data.message || data.error));
+                    setLoading(false);
+                    ws.close();
+                }
+            };
+
+            ws.onmessage = (event) => {
+                const frame = JSON.parse(event.data);
+                // Protocol 2 coalesces several events into one frame.
+                (frame.v === 2 ? frame.events : [frame]).forEach(handleEvent);
+            };
+
+            ws.onclose = () => {
+                if (finished) return;
+                if (sessionId && retries < 5) {
+                    retries += 1;
+                    setWsStatus('Reconnecting...');
+                    setTimeout(connect, 1000 * retries);
+                    return;
+                }
+                setMessage('WebSocket connection failed.');
                 setLoading(false);
-                ws.close();
-            }
-        };
+            };
 
-        ws.onerror = (err) => {
-            console.error('WebSocket Error:', err);
-            setMessage('WebSocket connection failed.');
-            setLoading(false);
+            ws.onerror = (err) => {
+                console.error('WebSocket Error:', err);
+            };
         };
+
+        connect();
     };
 
     return (
@@ -167,10 +240,11 @@ const StudentDashboard = () => {
                             const isAuditing = auditingIds.has(job.id);
                             const isTailoring = tailoringIds.has(job.id);
                             const violation = violations[job.id];
+                            const heldReason = heldApplications[job.id];
                             const currentTab = activeTabs[job.id] || 'overview';
 
                             return (
-                                <div key={job.id} className={`job-card ${isApplying ? 'is-applying' : ''} ${isApplied ? 'is-applied' : ''} ${isAuditing ? 'is-auditing' : ''} ${violation ? 'is-blocked' : ''}`}>
+                                <div key={job.id} className={`job-card ${isApplying ? 'is-applying' : ''} ${isApplied ? 'is-applied' : ''} ${isAuditing ? 'is-auditing' : ''} ${violation ? 'is-blocked' : ''} ${heldReason ? 'is-held' : ''}`}>
                                     <div className="job-header-row">
                                         <h4>{job.title}</h4>
                                         <div className="badge-group">
@@ -184,6 +258,7 @@ const StudentDashboard = () => {
                                             {isApplying && <span className="status-badge applying">Applying...</span>}
                                             {isApplied && <span className="status-badge applied">Applied ✅</span>}
                                             {violation && <span className="status-badge blocked">BLOCKED ⚠️</span>}
+                                            {heldReason && <span className="status-badge held">HELD ⏸️</span>}
                                         </div>
                                     </div>
                                     <p className="company">{job.company}</p>
@@ -206,6 +281,12 @@ const StudentDashboard = () => {
                                     )}
 
                                     <div className="card-body">
+                                        {heldReason && !violation && (
+                                            <div className="held-report">
+                                                <strong>Application Held:</strong>
+                                                <p className="held-reason">{heldReason}</p>
+                                            </div>
+                                        )}
                                         {violation ? (
                                             <div className="violation-report">
                                                 <strong>Safety Violation Detected:</strong>